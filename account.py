@@ -1,106 +1,275 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime, Numeric
-from sqlalchemy.orm import relationship, backref, mapped_column
+from sqlalchemy import Integer, String, ForeignKey, Date, select, func, event, inspect
+from sqlalchemy.orm import relationship, backref, mapped_column, reconstructor, object_session, Session
 from database import Base
 
-from decimal import Decimal
+from collections import Counter
 from transaction import Transaction
-from datetime import datetime, date, timedelta
-from errors import OverdrawError, TransactionSequenceError
+from balance_snapshot import BalanceSnapshot, record_balance_change
+from ledger import Ledger
+from datetime import date, timedelta
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError
 import logging
 
+def _month_bounds(year, month):
+    """Returns the first and last day of the month."""
+    first = date(year, month, 1)
+    return first, date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+
+
 class Account(Base):
 
     __tablename__ = "account"
     _bank_id = mapped_column(Integer, ForeignKey("bank._id"))
-    _transactions = relationship("Transaction", backref=backref("account"))
+    _transactions = relationship("Transaction", backref=backref("account"), collection_class=Ledger,
+                                 order_by="(Transaction._date, Transaction._id)")
     _account_number = mapped_column(Integer, primary_key=True, autoincrement=False)
-    _balance = mapped_column(Numeric)
+    #balance in integer cents
+    _balance = mapped_column(Integer)
     _type = mapped_column(String)
+    #bumped on every update, so a write based on a stale balance fails instead of overwriting another process
+    _version = mapped_column(Integer, nullable=False, server_default="1")
+    #kept in step with every posting, so period checks don't have to look at the history
+    _latest_transaction_date = mapped_column(Date)
+    _last_interest_date = mapped_column(Date)
 
     __mapper_args__ = {
         'polymorphic_identity':'account',
-        'polymorphic_on':_type
+        'polymorphic_on':_type,
+        'version_id_col':_version
     }
 
     """Represents a generic bank account with functionality to manage transactions."""
     def __init__(self, account_number):
         """Initializes the account instance."""
         self._account_number = account_number
-        self._balance = Decimal('0.00')
-
-    def add_transaction(self, amount, date, typeof, session):
-        """Adds a new transaction to the account and updates the balance."""
-        transaction = Transaction(Decimal(amount), date, typeof)
-        self._transactions.append(transaction)
-        self._balance += Decimal(amount)
-        self._transactions.sort()
+        self._balance = 0
+        self._reset_validation_state()
+        self._validation_state_loaded = True
+
+    @reconstructor
+    def _init_on_load(self):
+        """Defers building the validation state until the account is first validated."""
+        self._invalidate_validation_state()
+
+    def _reset_validation_state(self):
+        self._daily_counts = Counter()
+        self._monthly_counts = Counter()
+
+    def _invalidate_validation_state(self):
+        self._reset_validation_state()
+        self._validation_state_loaded = False
+
+    def _ledger_loaded(self):
+        return "_transactions" not in inspect(self).unloaded
+
+    def _ensure_validation_state(self):
+        """Rebuilds the full validation state from the transaction history if it is already loaded.
+
+        Otherwise the state stays partial: the counts for each day and month are queried through
+        the indexes when first needed, and kept up to date from then on.
+        """
+        if self._validation_state_loaded or not self._ledger_loaded():
+            return
+        self._reset_validation_state()
+        for transaction in self._transactions:
+            self._record_transaction(transaction)
+        self._validation_state_loaded = True
+
+    def _record_transaction(self, transaction):
+        """Updates the per-day and per-month normal transaction counts that are known."""
+        transaction_date = transaction.get_date()
+        if transaction.get_type() == "normal":
+            month = (transaction_date.year, transaction_date.month)
+            if self._validation_state_loaded or transaction_date in self._daily_counts:
+                self._daily_counts[transaction_date] += 1
+            if self._validation_state_loaded or month in self._monthly_counts:
+                self._monthly_counts[month] += 1
+
+    def _get_latest_date(self):
+        """Returns the date of the newest transaction, or None when there are none."""
+        return self._latest_transaction_date
+
+    def _daily_count(self, day):
+        """Returns the number of normal transactions on day."""
+        self._ensure_validation_state()
+        if not self._validation_state_loaded and day not in self._daily_counts:
+            self._daily_counts[day] = self._query_normal_count(day, day)
+        return self._daily_counts[day]
+
+    def _monthly_count(self, year, month):
+        """Returns the number of normal transactions in the month."""
+        self._ensure_validation_state()
+        if not self._validation_state_loaded and (year, month) not in self._monthly_counts:
+            self._monthly_counts[(year, month)] = self._query_normal_count(*_month_bounds(year, month))
+        return self._monthly_counts[(year, month)]
+
+    #indexed queries used while the ledger isn't loaded; pending transactions are flushed first
+
+    def _query_normal_count(self, start, end):
+        session = object_session(self)
+        if session is None:
+            return 0
+        return session.scalar(select(func.count()).select_from(Transaction).where(
+            Transaction._account_id == self._account_number, Transaction._typeof == "normal",
+            Transaction._date.between(start, end)))
+
+    def add_transaction(self, amount, date, typeof, session, commit=True):
+        """Adds a new transaction of amount cents to the account and updates the balance, committing unless told not to."""
+        self._ensure_validation_state()
+        transaction = Transaction(amount, date, typeof)
+        if self._ledger_loaded():
+            self._transactions.append(transaction)
+        else:
+            #the backref queues the append without loading the whole history
+            transaction.account = self
+        self._balance += amount
+        if self._latest_transaction_date is None or date > self._latest_transaction_date:
+            self._latest_transaction_date = date
+        if typeof == "interest" and (self._last_interest_date is None or date > self._last_interest_date):
+            self._last_interest_date = date
+        self._record_transaction(transaction)
+        if date is not None:
+            record_balance_change(session, self._account_number, date, amount)
         session.add(transaction)
-        logging.debug(f"Created transaction: {self._account_number}, {amount}")
-        session.commit()
+        logging.debug("Created transaction: %s, %s cents", self._account_number, amount)
+        if commit:
+            session.commit()
 
 
     def can_add_transaction(self, amount, date):
-        """Determines if this account can add transactions and raises OverdrawError if not."""
-        new_balance = self._balance + Decimal(amount)
-        if new_balance < Decimal('0.00'):
+        """Determines if this account can add a transaction of amount cents and raises OverdrawError if not."""
+        if self._balance + amount < 0:
             raise OverdrawError()
-        if len(self._transactions) > 0:
-            latest_transaction_date = max(t.get_date() for t in self._transactions)
-            if date < latest_transaction_date:
-                raise TransactionSequenceError(latest_date=latest_transaction_date)
+        self._check_date_order(date)
         return True
 
-    def print_transactions(self):
-        """Prints a list of all transactions sorted by date."""
-        for transaction in self._transactions:
+    def can_restore_transaction(self, typeof, date):
+        """Determines if an interest or fees row read back from an export can be added on date.
+
+        It must be in date order, and interest can only be restored once per month.
+        """
+        self._check_date_order(date)
+        if typeof == "interest" and self._has_interest_been_applied_in(date.year, date.month):
+            raise TransactionLimitError(latest_date=date)
+        return True
+
+    def _check_date_order(self, date):
+        """Raises TransactionSequenceError if date is before the newest transaction."""
+        latest_date = self._get_latest_date()
+        if latest_date is not None and date < latest_date:
+            raise TransactionSequenceError(latest_date=latest_date)
+
+    def print_transactions(self, page_size=500):
+        """Prints a list of all transactions sorted by date, streaming them a page at a time."""
+        session = object_session(self)
+        if session is None:
+            for transaction in self._transactions:
+                print(transaction)
+            return
+        for transaction in session.scalars(self._transactions_query().execution_options(yield_per=page_size)):
             print(transaction)
         
     def get_account_number(self):
         """Getter for the account number"""
         return self._account_number
     
-    def get_transactions(self):
-        return self._transactions
-    
-    def _get_last_day_of_month(self):
-        if not self._transactions:
-            return
-        latest_transaction = max(self._transactions)
-        first_of_next_month = date(latest_transaction.get_date().year + latest_transaction.get_date().month // 12,
-                                   latest_transaction.get_date().month % 12 + 1, 1)
-
-        return first_of_next_month - timedelta(days=1)
-    
-    def _has_interest_been_applied(self):
-        if not self._transactions:
-            return False  
-        
-        last_transaction = max(self._transactions)
-        last_transaction_month = last_transaction.get_date().month
-        last_transaction_year = last_transaction.get_date().year
-        
-        for transaction in self._transactions:
-            if ((transaction.get_type() == "interest") and 
-                transaction.get_date().year == last_transaction_year and 
-                transaction.get_date().month == last_transaction_month):
-                return True
-                
-        return False
+    def _transactions_query(self, start=None, end=None):
+        statement = (select(Transaction)
+                     .where(Transaction._account_id == self._account_number)
+                     .order_by(Transaction._date, Transaction._id))
+        if start is not None:
+            statement = statement.where(Transaction._date >= start)
+        if end is not None:
+            statement = statement.where(Transaction._date <= end)
+        return statement
 
+    def get_transactions(self, start=None, end=None, offset=0, limit=None):
+        """Returns transactions in date order between the optional start and end dates, one page at a time when a limit is given.
 
+        Only the requested rows are queried; the rest of the history is not loaded.
+        """
+        session = object_session(self)
+        if session is None:
+            transactions = [t for t in self._transactions
+                            if (start is None or t.get_date() >= start) and (end is None or t.get_date() <= end)]
+            return transactions[offset:None if limit is None else offset + limit]
+        statement = self._transactions_query(start, end).offset(offset).limit(limit)
+        return session.scalars(statement).all()
 
+    def count_transactions(self, start=None, end=None):
+        """Returns the number of transactions between the optional start and end dates without loading them."""
+        session = object_session(self)
+        if session is None:
+            return len(self.get_transactions(start, end))
+        return session.scalar(select(func.count()).select_from(self._transactions_query(start, end).subquery()))
+    
+    def balance_as_of(self, day):
+        """Returns the balance in cents at the end of day, from the last monthly snapshot before day's month plus that month's transactions."""
+        session = object_session(self)
+        if session is None:
+            return sum(t.get_amount() for t in self._transactions if t.get_date() <= day)
+        first_day = day.replace(day=1)
+        opening = session.scalar(select(BalanceSnapshot._balance)
+                                 .where(BalanceSnapshot._account_id == self._account_number, BalanceSnapshot._month < first_day)
+                                 .order_by(BalanceSnapshot._month.desc()).limit(1))
+        posted = session.scalar(select(func.sum(Transaction._amount)).where(
+            Transaction._account_id == self._account_number, Transaction._date.between(first_day, day)))
+        return (opening or 0) + (posted or 0)
 
+    def _get_last_day_of_month(self):
+        latest_date = self._get_latest_date()
+        if latest_date is None:
+            return
+        return _month_bounds(latest_date.year, latest_date.month)[1]
     
+    def _has_interest_been_applied(self):
+        latest_date = self._get_latest_date()
+        if latest_date is None:
+            return False
+        return self._has_interest_been_applied_in(latest_date.year, latest_date.month)
 
+    def _has_interest_been_applied_in(self, year, month):
+        #postings can't be back-dated, so interest is applied in month order and the latest month is enough
+        last = self._last_interest_date
+        return last is not None and (last.year, last.month) == (year, month)
 
+    def close_month(self, last_day, session):
+        """Applies interest and fees for the month ending on last_day without committing.
 
+        Returns False when the month was already closed or the account has nothing to close.
+        """
+        latest_date = self._get_latest_date()
+        if latest_date is None or latest_date > last_day:
+            return False
+        if self._has_interest_been_applied_in(last_day.year, last_day.month):
+            return False
+        self._post_interest_and_fees(last_day, session)
+        return True
 
+    def _post_interest_and_fees(self, last_day, session):
+        for amount, typeof in self.interest_and_fees(self._balance):
+            self.add_transaction(amount, last_day, typeof, session, commit=False)
 
+    def reload_state(self, session):
+        """Expires the account and its cached validation state after it was changed outside the ORM."""
+        session.expire(self)
+        self._invalidate_validation_state()
 
 
+@event.listens_for(Account, "expire", propagate=True)
+def _discard_expired_validation_state(account, attrs):
+    """Drops the cached counts with the expired columns, since another session may have posted since they were read."""
+    account._invalidate_validation_state()
 
 
+@event.listens_for(Account, "refresh", propagate=True)
+def _discard_refreshed_validation_state(account, context, attrs):
+    account._invalidate_validation_state()
 
-    
-    
 
+@event.listens_for(Session, "after_rollback")
+def _discard_validation_state(session):
+    """Makes accounts rebuild their validation state, which may count transactions that were rolled back."""
+    for instance in session.identity_map.values():
+        if isinstance(instance, Account):
+            instance._invalidate_validation_state()
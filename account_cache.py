@@ -0,0 +1,108 @@
+"""A bounded, least recently used cache of the accounts a bank has handed out.
+
+Long sessions would otherwise keep every account they touched, with its loaded ledger and
+validation state, in memory. The cache is limited both by a number of accounts and by the total
+number of transactions in their loaded ledgers; cold accounts are dropped and expunged from
+their session once either limit is exceeded.
+"""
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import inspect
+
+MAX_ACCOUNTS = 1000
+MAX_TRANSACTIONS = 100000
+
+CacheStats = namedtuple("CacheStats", ["hits", "misses", "evictions", "accounts", "transactions",
+                                       "max_accounts", "max_transactions"])
+
+
+class AccountCache:
+    """Accounts by number in least to most recently used order."""
+    def __init__(self, max_accounts=MAX_ACCOUNTS, max_transactions=MAX_TRANSACTIONS):
+        self.max_accounts = max_accounts
+        self.max_transactions = max_transactions
+        self._accounts = OrderedDict()
+        #loaded ledger size of each account when it was last used
+        self._costs = {}
+        self._transactions = 0
+        self._pinned = None
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def get(self, account_number):
+        """Returns the cached account and marks it as the most recently used, or None on a miss."""
+        account = self._accounts.get(account_number)
+        if account is not None and _is_detached(account):
+            #a rolled back new account, or one expunged by someone else, has to be looked up again
+            del self._accounts[account_number]
+            self._transactions -= self._costs.pop(account_number)
+            account = None
+        if account is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._refresh_latest_cost()
+        self._accounts.move_to_end(account_number)
+        self._update_cost(account_number, account)
+        self._evict()
+        return account
+
+    def put(self, account_number, account):
+        """Adds or refreshes an account as the most recently used, evicting cold accounts if over a limit."""
+        self._refresh_latest_cost()
+        self._accounts[account_number] = account
+        self._accounts.move_to_end(account_number)
+        self._update_cost(account_number, account)
+        self._evict()
+
+    def pin(self, account_number):
+        """Keeps one account, such as the one selected in a front end, from being evicted; None unpins it."""
+        self._pinned = account_number
+
+    def resize(self, max_accounts=None, max_transactions=None):
+        if max_accounts is not None:
+            self.max_accounts = max_accounts
+        if max_transactions is not None:
+            self.max_transactions = max_transactions
+        self._evict()
+
+    def stats(self):
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._accounts), self._transactions,
+                          self.max_accounts, self.max_transactions)
+
+    def _refresh_latest_cost(self):
+        #the account used last is the one most likely to have loaded its ledger since it was cached
+        if self._accounts:
+            account_number = next(reversed(self._accounts))
+            self._update_cost(account_number, self._accounts[account_number])
+
+    def _update_cost(self, account_number, account):
+        cost = len(account._transactions) if account._ledger_loaded() else 0
+        self._transactions += cost - self._costs.get(account_number, 0)
+        self._costs[account_number] = cost
+
+    def _evict(self):
+        while len(self._accounts) > self.max_accounts or self._transactions > self.max_transactions:
+            #the most recently used account stays, even when its ledger alone is over the budget
+            victim = next((number for number in self._accounts
+                           if number != self._pinned and number != next(reversed(self._accounts))), None)
+            if victim is None:
+                return
+            account = self._accounts.pop(victim)
+            self._transactions -= self._costs.pop(victim)
+            self.evictions += 1
+            _detach(account)
+
+
+def _is_detached(account):
+    state = inspect(account)
+    return state.transient or state.detached
+
+
+def _detach(account):
+    """Expunges a clean account from its session; one with unflushed changes stays until it is committed."""
+    state = inspect(account)
+    if state.session is not None and state.persistent and not state.modified:
+        state.session.expunge(account)
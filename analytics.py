@@ -0,0 +1,234 @@
+"""Compact, array-backed snapshot of the transactions table for bank-wide analytics.
+
+NumPy is used for the vectorized paths when it is installed; otherwise the same queries run
+over the plain arrays.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from collections import Counter
+from itertools import accumulate
+import heapq
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TYPE_CODES = {"normal": 0, "interest": 1, "fees": 2}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+#rows are keyed by (account index << _DATE_BITS) | date ordinal, which sorts like (account, date)
+_DATE_BITS = 24
+
+
+class LedgerSnapshot:
+    """Columns of account number, date ordinal, amount in cents and type code, one entry per transaction.
+
+    Rows are sorted by account and date, with a running total of amounts, so a balance on
+    any date is two binary searches and a subtraction.
+    """
+    def __init__(self, account_ids, date_ordinals, amounts, type_codes, months, unknown_types=None):
+        self.account_ids = account_ids
+        self.date_ordinals = date_ordinals
+        self.amounts = amounts
+        self.type_codes = type_codes
+        #months since year 0, for grouping by calendar month
+        self.months = months
+        #transactions left out because their type is not in TYPE_CODES, counted by type
+        self.unknown_types = Counter(unknown_types or ())
+        self._index_accounts()
+        if numpy is not None:
+            self._vectors = {
+                "account_ids": numpy.frombuffer(account_ids, dtype=numpy.int64),
+                "date_ordinals": numpy.frombuffer(date_ordinals, dtype=numpy.int32),
+                "amounts": numpy.frombuffer(amounts, dtype=numpy.int64),
+                "type_codes": numpy.frombuffer(type_codes, dtype=numpy.int8),
+                "months": numpy.frombuffer(months, dtype=numpy.int32),
+                "keys": numpy.frombuffer(self._keys, dtype=numpy.int64),
+                "running_totals": numpy.frombuffer(self._running_totals, dtype=numpy.int64),
+                "starts": numpy.frombuffer(self._starts, dtype=numpy.int64),
+            }
+
+    @classmethod
+    def load(cls, session, chunk_size=50000):
+        """Builds a snapshot with one raw query over the transactions table, without creating ORM objects.
+
+        Rows without an account or date are left out, as are rows of an unknown type, which are
+        counted in unknown_types instead of being totalled as one of the known ones.
+        """
+        account_ids = array('q')
+        date_ordinals = array('i')
+        amounts = array('q')
+        type_codes = array('b')
+        months = array('i')
+        unknown_types = Counter()
+        codes = dict(TYPE_CODES)
+        parsed_dates = {}
+        result = session.connection().exec_driver_sql(
+            "SELECT _account_id, _date, _amount, _typeof FROM transactions "
+            "WHERE _account_id IS NOT NULL AND _date IS NOT NULL ORDER BY _account_id, _date, _id")
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            for account_id, day, amount, typeof in rows:
+                code = codes.get(typeof)
+                if code is None:
+                    unknown_types[typeof] += 1
+                    continue
+                parsed = parsed_dates.get(day)
+                if parsed is None:
+                    posted = date.fromisoformat(day)
+                    parsed = parsed_dates[day] = (posted.toordinal(), posted.year * 12 + posted.month - 1)
+                account_ids.append(account_id)
+                date_ordinals.append(parsed[0])
+                months.append(parsed[1])
+                amounts.append(amount)
+                type_codes.append(code)
+        if unknown_types:
+            logging.warning("Left %d transactions of unknown types out of the snapshot: %s",
+                            sum(unknown_types.values()), dict(unknown_types))
+        return cls(account_ids, date_ordinals, amounts, type_codes, months, unknown_types)
+
+    def _index_accounts(self):
+        self._accounts = array('q')
+        self._starts = array('q')
+        self._keys = array('q')
+        for row, account_id in enumerate(self.account_ids):
+            if not self._accounts or self._accounts[-1] != account_id:
+                self._accounts.append(account_id)
+                self._starts.append(row)
+            self._keys.append(((len(self._accounts) - 1) << _DATE_BITS) | self.date_ordinals[row])
+        self._starts.append(len(self.account_ids))
+        self._running_totals = array('q', [0])
+        self._running_totals.extend(accumulate(self.amounts))
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def accounts(self):
+        """Returns the account numbers that have transactions, in order."""
+        return list(self._accounts)
+
+    def _account_index(self, account_number):
+        i = bisect_left(self._accounts, account_number)
+        if i == len(self._accounts) or self._accounts[i] != account_number:
+            return None
+        return i
+
+    def balance_as_of(self, account_number, day):
+        """Returns the account's balance in cents at the end of day."""
+        i = self._account_index(account_number)
+        if i is None:
+            return 0
+        start = self._starts[i]
+        cut = bisect_right(self._keys, (i << _DATE_BITS) | day.toordinal(), start, self._starts[i + 1])
+        return self._running_totals[cut] - self._running_totals[start]
+
+    def balances_as_of(self, day):
+        """Returns a dict of account number to balance in cents at the end of day, for every account."""
+        if numpy is not None:
+            vectors = self._vectors
+            indexes = numpy.arange(len(self._accounts), dtype=numpy.int64)
+            cuts = numpy.searchsorted(vectors["keys"], (indexes << _DATE_BITS) | day.toordinal(), side="right")
+            totals = vectors["running_totals"]
+            balances = totals[cuts] - totals[vectors["starts"][:-1]]
+            return dict(zip(self._accounts, balances.tolist()))
+        return {account_number: self.balance_as_of(account_number, day) for account_number in self._accounts}
+
+    def _row_range(self, account_number):
+        if account_number is None:
+            return 0, len(self)
+        i = self._account_index(account_number)
+        if i is None:
+            return 0, 0
+        return self._starts[i], self._starts[i + 1]
+
+    def account_totals(self, start, end, account_number=None):
+        """Returns a dict of account number to (credits, debits, interest, fees) in cents posted from start to end.
+
+        Credits and debits are the positive and negative normal transactions; debits and fees are negative.
+        Pass account_number to only total that account.
+        """
+        first, last = start.toordinal(), end.toordinal()
+        low, high = self._row_range(account_number)
+        if numpy is not None:
+            vectors = self._vectors
+            ordinals = vectors["date_ordinals"][low:high]
+            rows = low + numpy.flatnonzero((ordinals >= first) & (ordinals <= last))
+            amounts = vectors["amounts"][rows]
+            types = vectors["type_codes"][rows]
+            categories = numpy.where(types == TYPE_CODES["normal"], (amounts < 0).astype(numpy.int64),
+                                     numpy.where(types == TYPE_CODES["interest"], 2, 3))
+            totals = numpy.zeros((len(self._accounts), 4), dtype=numpy.int64)
+            numpy.add.at(totals, (vectors["keys"][rows] >> _DATE_BITS, categories), amounts)
+            active = numpy.flatnonzero(numpy.bincount(vectors["keys"][rows] >> _DATE_BITS, minlength=len(self._accounts)))
+            return {self._accounts[i]: tuple(totals[i].tolist()) for i in active.tolist()}
+        totals = {}
+        for row in range(low, high):
+            if first <= self.date_ordinals[row] <= last:
+                amount = self.amounts[row]
+                code = self.type_codes[row]
+                if code == TYPE_CODES["normal"]:
+                    category = 1 if amount < 0 else 0
+                else:
+                    category = 2 if code == TYPE_CODES["interest"] else 3
+                account_totals = totals.setdefault(self.account_ids[row], [0, 0, 0, 0])
+                account_totals[category] += amount
+        return {account_number: tuple(values) for account_number, values in totals.items()}
+
+    def monthly_net_flow(self, account_number=None):
+        """Returns a dict of (year, month) to the net cents posted that month, bank-wide or for one account."""
+        start, end = self._row_range(account_number)
+        if start == end:
+            return {}
+        if numpy is not None:
+            months = self._vectors["months"][start:end]
+            first = int(months.min())
+            totals = numpy.zeros(int(months.max()) - first + 1, dtype=numpy.int64)
+            numpy.add.at(totals, months - first, self._vectors["amounts"][start:end])
+            present = numpy.zeros(len(totals), dtype=bool)
+            present[months - first] = True
+            return {((first + offset) // 12, (first + offset) % 12 + 1): int(totals[offset])
+                    for offset in numpy.flatnonzero(present).tolist()}
+        flow = {}
+        for row in range(start, end):
+            flow[self.months[row]] = flow.get(self.months[row], 0) + self.amounts[row]
+        return {(month // 12, month % 12 + 1): total for month, total in sorted(flow.items())}
+
+    def top_accounts(self, n, day=None):
+        """Returns the n (account number, balance in cents) pairs with the largest balances as of day."""
+        if day is None:
+            day = date.max
+        balances = self.balances_as_of(day)
+        return heapq.nlargest(n, balances.items(), key=lambda item: item[1])
+
+    def top_transactions(self, n, typeof=None, largest=True):
+        """Returns the n largest (or smallest) transactions as (account number, date, cents, type) tuples."""
+        if numpy is not None:
+            amounts = self._vectors["amounts"]
+            rows = numpy.arange(len(amounts))
+            if typeof is not None:
+                rows = numpy.flatnonzero(self._vectors["type_codes"] == TYPE_CODES.get(typeof, -1))
+            selected = amounts[rows] if largest else -amounts[rows]
+            if len(rows) > n:
+                #everything above the nth value, then ties in row order, to match a stable sort
+                threshold = numpy.partition(selected, len(selected) - n)[len(selected) - n]
+                above = numpy.flatnonzero(selected > threshold)
+                ties = numpy.flatnonzero(selected == threshold)[:n - len(above)]
+                best = numpy.concatenate([above, ties])
+            else:
+                best = numpy.arange(len(rows))
+            best = best[numpy.argsort(-selected[best], kind="stable")]
+            chosen = rows[best].tolist()
+        else:
+            rows = range(len(self))
+            if typeof is not None:
+                code = TYPE_CODES.get(typeof, -1)
+                rows = [row for row in rows if self.type_codes[row] == code]
+            pick = heapq.nlargest if largest else heapq.nsmallest
+            chosen = pick(n, rows, key=lambda row: self.amounts[row])
+        return [(self.account_ids[row], date.fromordinal(self.date_ordinals[row]),
+                 self.amounts[row], TYPE_NAMES[self.type_codes[row]]) for row in chosen]
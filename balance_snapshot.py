@@ -0,0 +1,72 @@
+"""Closing balances of every account at the end of each month it has transactions in.
+
+Postings made through the ORM are recorded on the session and written when it flushes; bulk
+writers call apply_balance_changes themselves. A balance on any past date is then the last
+snapshot before that date's month plus that month's transactions. Run
+``python cli.py --rebuild-snapshots`` to rebuild them from the transaction history.
+"""
+from collections import Counter
+
+from sqlalchemy import Integer, Date, ForeignKey, select, insert, update, func, event, bindparam
+from sqlalchemy.orm import mapped_column, Session
+
+from database import Base
+
+
+class BalanceSnapshot(Base):
+
+    __tablename__ = "balance_snapshots"
+    _account_id = mapped_column(Integer, ForeignKey("account._account_number"), primary_key=True)
+    #first day of the month
+    _month = mapped_column(Date, primary_key=True)
+    #balance in integer cents at the end of the month
+    _balance = mapped_column(Integer, nullable=False)
+
+
+def record_balance_change(session, account_number, day, amount):
+    """Queues a change of amount cents to an account's closing balance for day's month, written at the next flush."""
+    session.info.setdefault("balance_changes", Counter())[(account_number, day.replace(day=1))] += amount
+
+
+def apply_balance_changes(connection, changes):
+    """Adds each {"number", "month", "delta"} change to the snapshot of that month and of every later one.
+
+    A month without a snapshot gets one first, starting from the closing balance of the month before it.
+    """
+    snapshots = BalanceSnapshot.__table__
+    number = bindparam("number", type_=Integer)
+    month = bindparam("month", type_=Date)
+    previous = (select(snapshots.c._balance)
+                .where(snapshots.c._account_id == number, snapshots.c._month < month)
+                .order_by(snapshots.c._month.desc()).limit(1).scalar_subquery())
+    connection.execute(insert(snapshots).prefix_with("OR IGNORE")
+                       .from_select(["_account_id", "_month", "_balance"], select(number, month, func.coalesce(previous, 0))),
+                       changes)
+    connection.execute(update(snapshots).where(snapshots.c._account_id == number, snapshots.c._month >= month)
+                       .values(_balance=snapshots.c._balance + bindparam("delta")),
+                       changes)
+
+
+def rebuild_balance_snapshots(connection):
+    """Replaces every snapshot with running monthly totals of the transaction history and returns how many were written."""
+    connection.exec_driver_sql("DELETE FROM balance_snapshots")
+    return connection.exec_driver_sql(
+        "INSERT INTO balance_snapshots (_account_id, _month, _balance) "
+        "SELECT _account_id, _month, SUM(total) OVER (PARTITION BY _account_id ORDER BY _month) "
+        "FROM (SELECT _account_id, date(_date, 'start of month') AS _month, SUM(_amount) AS total "
+        "FROM transactions WHERE _date IS NOT NULL GROUP BY _account_id, _month)").rowcount
+
+
+@event.listens_for(Session, "after_flush")
+def _write_balance_changes(session, flush_context):
+    """Writes the queued changes after the accounts' version checked updates, in the same transaction."""
+    changes = session.info.pop("balance_changes", None)
+    if changes:
+        apply_balance_changes(session.connection(), [{"number": number, "month": month, "delta": delta}
+                                                     for (number, month), delta in changes.items()])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_balance_changes(session):
+    session.info.pop("balance_changes", None)
+
@@ -1,12 +1,25 @@
-from sqlalchemy import Integer, String, ForeignKey, DateTime
-from sqlalchemy.orm import relationship, backref, mapped_column
+from sqlalchemy import Integer, select, func, update
+from sqlalchemy.orm import relationship, mapped_column, reconstructor, object_session
 from database import Base
 
 from account import Account
 from checking_account import Checking
 from savings_account import Savings
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError
+from concurrency import retry_on_conflict
+from account_cache import AccountCache
+from instrumentation import instrumented
+from money import to_cents, parse_dollars
+from month_end import close_month_parallel
+from collections import namedtuple
+from datetime import date, timedelta
 import pickle
 import logging
+import time
+
+
+TransactionResult = namedtuple("TransactionResult", ["row", "account_number", "accepted", "reason"])
+MonthCloseResult = namedtuple("MonthCloseResult", ["processed", "skipped", "seconds", "accounts_per_second"])
 
 
 class Bank(Base):
@@ -15,52 +28,261 @@ class Bank(Base):
     __tablename__ = "bank"
     _id = mapped_column(Integer, primary_key=True)
     _number_accounts_opened = mapped_column(Integer)
-    _accounts = relationship("Account")
+    _version = mapped_column(Integer, nullable=False, server_default="1")
+    _accounts = relationship("Account", lazy="write_only")
+
+    __mapper_args__ = {"version_id_col": _version}
 
     def __init__(self):
         """Initializes the bank instance"""
         self._number_accounts_opened = 0
+        self._account_cache = AccountCache()
+
+    @reconstructor
+    def _init_on_load(self):
+        """Starts an empty account cache when the bank is loaded; accounts are cached as they are fetched."""
+        self._account_cache = AccountCache()
+
+    def _index_accounts(self, accounts):
+        for account in accounts:
+            self._account_cache.put(account.get_account_number(), account)
+        return accounts
+
+    def configure_account_cache(self, max_accounts=None, max_transactions=None):
+        """Sets how many accounts, and loaded transactions across them, stay cached before cold ones are evicted."""
+        self._account_cache.resize(max_accounts, max_transactions)
+
+    def account_cache_stats(self):
+        """Returns the account cache's CacheStats: hits, misses, evictions and current size."""
+        return self._account_cache.stats()
+
+    def pin_account(self, account):
+        """Keeps account, e.g. the one selected in a front end, cached and attached; None unpins it."""
+        self._account_cache.pin(None if account is None else account.get_account_number())
+
+    def count_accounts(self):
+        """Returns the number of accounts without loading them."""
+        session = object_session(self)
+        return session.scalar(select(func.count()).select_from(self._accounts.select().subquery()))
+
+    def get_accounts(self, offset=0, limit=None, after=None, before=None):
+        """Fetches accounts in account number order, one page at a time when a limit is given.
+
+        With after or before, the page is the accounts numbered just above or just below that
+        number, found through the primary key however far into the bank it is.
+        """
+        session = object_session(self)
+        statement = self._accounts.select()
+        if after is not None:
+            statement = statement.where(Account._account_number > after)
+        if before is not None:
+            statement = statement.where(Account._account_number < before).order_by(Account._account_number.desc())
+        else:
+            statement = statement.order_by(Account._account_number)
+        accounts = session.scalars(statement.offset(offset).limit(limit)).all()
+        if before is not None:
+            accounts.reverse()
+        return self._index_accounts(accounts)
 
-    def get_accounts(self):
-        return self._accounts
+    def get_account_balances(self, first=None, last=None):
+        """Returns a dict of account number to balance, optionally for numbers first..last, read with one query instead of loading each account."""
+        session = object_session(self)
+        statement = select(Account._account_number, Account._balance).where(Account._bank_id == self._id)
+        if first is not None:
+            statement = statement.where(Account._account_number >= first)
+        if last is not None:
+            statement = statement.where(Account._account_number <= last)
+        return dict(session.execute(statement).all())
 
+    @instrumented("Bank.open_account")
     def open_account(self, account_type, session):
         """Open a new account of a specified type ('checking' or 'savings')."""
-        self._number_accounts_opened += 1
+        account_number = retry_on_conflict(lambda: self._next_account_number(session), session)
         if (account_type == "checking"):
-            account = Checking(self._number_accounts_opened)
+            account = Checking(account_number)
         if (account_type == "savings"):
-            account = Savings(self._number_accounts_opened)
-        self._accounts.append(account)
+            account = Savings(account_number)
+        self._accounts.add(account)
+        self._account_cache.put(account_number, account)
         session.add(account)
-        logging.debug(f"Created account: {account.get_account_number()}")
+        logging.debug("Created account: %s", account.get_account_number())
         return account
 
-    def print_summary(self):
-        """Print a summary of all accounts and their current balances."""
-        for account in self._accounts:
+    def _next_account_number(self, session):
+        """Increments the opened-accounts counter in the database and returns the new value.
+
+        The increment happens in SQL, so processes opening accounts at the same time each get a
+        different number; the write lock it takes is held until the caller commits.
+        """
+        statement = (update(Bank).where(Bank._id == self._id)
+                     .values(_number_accounts_opened=Bank._number_accounts_opened + 1, _version=Bank._version + 1)
+                     .returning(Bank._number_accounts_opened)
+                     .execution_options(synchronize_session="fetch"))
+        return session.execute(statement).scalar_one()
+
+    def print_summary(self, page_size=500):
+        """Print a summary of all accounts and their current balances, streaming them a page at a time."""
+        session = object_session(self)
+        statement = self._accounts.select().order_by(Account._account_number).execution_options(yield_per=page_size)
+        for account in session.scalars(statement):
             print(account)
 
+    @instrumented("Bank.get_account")
     def get_account(self, account_number):
-        """Retrieve an account by its number. """
+        """Retrieve an account by its number, falling back to a primary key lookup on a cache miss."""
         account_number = int(account_number)
-        for account in self._accounts: 
-            if account.get_account_number() == account_number:
-                return account
+        account = self._account_cache.get(account_number)
+        if account is not None:
+            return account
+        session = object_session(self)
+        if session is None:
+            return None
+        account = session.get(Account, account_number)
+        if account is not None and account._bank_id == self._id:
+            self._account_cache.put(account_number, account)
+            return account
+        return None
 
+    @instrumented("Bank.add_transaction")
     def add_transaction(self, account, amount, date, session):
-        """Attempt to add a transaction to an account."""
-        if account.can_add_transaction(amount, date):
-            account.add_transaction(amount, date, "normal", session)
-            logging.debug("Saved to bank.db")
-        else:
-            pass
+        """Attempt to add a transaction of a dollar amount to an account, retrying if another process changed it first."""
+        amount = to_cents(amount)
+
+        def post():
+            if account.can_add_transaction(amount, date):
+                account.add_transaction(amount, date, "normal", session)
+                logging.debug("Saved to bank.db")
+
+        retry_on_conflict(post, session)
     
+    @instrumented("Bank.add_transactions")
+    def add_transactions(self, batch, session, chunk_size=500):
+        """Validate and post a batch of (account, amount, date) records, committing once per chunk.
+
+        Accounts may be given as Account objects or account numbers, and amounts are in dollars. A record
+        may carry a fourth type field; interest and fees rows, as read back from an export, are only
+        accepted for accounts that had no transactions when the batch started, so they restore a history
+        instead of changing a live balance. Returns one TransactionResult per record, with the error
+        message as the reason for rejected rows.
+        """
+        rows = list(enumerate(batch, start=1))
+        results = []
+        #account number to whether it had no transactions before this batch
+        restoring = {}
+        expire_on_commit = session.expire_on_commit
+        #keeps the posted accounts and their ledgers loaded across chunk commits
+        session.expire_on_commit = False
+        try:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                #a conflict rolls back the whole chunk, so every row in it is validated again
+                results.extend(retry_on_conflict(lambda: self._post_chunk(chunk, session, restoring), session))
+        except Exception:
+            #rows of the failed chunk that were already added must not be committed by whoever commits next
+            session.rollback()
+            raise
+        finally:
+            session.expire_on_commit = expire_on_commit
+        logging.debug("Posted batch: %s of %s accepted", sum(r.accepted for r in results), len(results))
+        return results
+
+    def _post_chunk(self, chunk, session, restoring):
+        results = []
+        for row, (account, amount, date, *typeof) in chunk:
+            typeof = typeof[0] if typeof else "normal"
+            if not isinstance(account, Account):
+                account_number = account
+                account = self.get_account(account_number)
+                if account is None:
+                    results.append(TransactionResult(row, account_number, False, "No such account."))
+                    continue
+            if account.get_account_number() not in restoring:
+                restoring[account.get_account_number()] = account._get_latest_date() is None
+            try:
+                amount = to_cents(parse_dollars(amount))
+                if typeof == "normal":
+                    account.can_add_transaction(amount, date)
+                elif not restoring[account.get_account_number()]:
+                    raise ValueError("Interest and fees rows can only be imported into an account without transactions.")
+                else:
+                    #month-end postings aren't held to overdraft or withdrawal limits
+                    account.can_restore_transaction(typeof, date)
+            except (OverdrawError, TransactionLimitError, TransactionSequenceError) as e:
+                results.append(TransactionResult(row, account.get_account_number(), False, e.message))
+                continue
+            except ValueError as e:
+                results.append(TransactionResult(row, account.get_account_number(), False, str(e)))
+                continue
+            account.add_transaction(amount, date, typeof, session, commit=False)
+            results.append(TransactionResult(row, account.get_account_number(), True, None))
+        session.commit()
+        return results
+
     def list_transactions(self, account):
         """Print all the transactions for the account."""
         account.print_transactions()
 
+    @instrumented("Bank.apply_interest_and_fees")
     def apply_interest_and_fees(self, account, session):
         """Apply interest and fees to an account."""
-        account.apply_interest_and_fees(session)
+        retry_on_conflict(lambda: account.apply_interest_and_fees(session), session)
+
+    @instrumented("Bank.close_month")
+    def close_month(self, year, month, session, chunk_size=500, workers=None):
+        """Apply interest and fees to every account for the given month, committing once per chunk.
+
+        Accounts that already have interest for the month are skipped, so an interrupted
+        run can simply be started again. Accounts with no transactions, or with transactions
+        after the end of the month, are skipped as well. With more than one worker the
+        postings are computed in a process pool and written here in bulk.
+        """
+        last_day = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        started = time.perf_counter()
+        if workers and workers > 1:
+            processed, skipped = close_month_parallel(self, session, date(year, month, 1), last_day, workers, chunk_size)
+        else:
+            processed, skipped = self._close_month_sequential(last_day, session, chunk_size)
+        seconds = time.perf_counter() - started
+        rate = processed / seconds if seconds > 0 else 0.0
+        logging.debug("Closed %d-%02d: %d accounts processed, %d skipped, %.1f accounts/s", year, month, processed, skipped, rate)
+        return MonthCloseResult(processed, skipped, seconds, rate)
+
+    def _close_month_sequential(self, last_day, session, chunk_size):
+        processed = skipped = 0
+        last_account_number = 0
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            while True:
+                #a conflict rolls back the chunk, and accounts it already closed are then skipped
+                closed = retry_on_conflict(lambda: self._close_chunk(last_day, session, last_account_number, chunk_size), session)
+                if closed is None:
+                    break
+                last_account_number, chunk_processed, chunk_skipped = closed
+                processed += chunk_processed
+                skipped += chunk_skipped
+        finally:
+            session.expire_on_commit = expire_on_commit
+        return processed, skipped
 
+    def _close_chunk(self, last_day, session, after_account_number, chunk_size):
+        """Closes the next chunk of accounts and commits; returns (last account number, processed, skipped) or None when done."""
+        accounts = session.scalars(
+            self._accounts.select()
+            .where(Account._account_number > after_account_number)
+            .order_by(Account._account_number)
+            .limit(chunk_size)
+        ).all()
+        if not accounts:
+            return None
+        processed = skipped = 0
+        #the select above flushed everything pending, and each account's checks only query its own
+        #rows, which nothing in this loop has posted to yet
+        with session.no_autoflush:
+            for account in accounts:
+                if account.close_month(last_day, session):
+                    processed += 1
+                else:
+                    skipped += 1
+        session.commit()
+        return accounts[-1].get_account_number(), processed, skipped
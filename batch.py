@@ -0,0 +1,135 @@
+"""Non-interactive commands for replaying feeds through the CLI, one command per line:
+
+    open checking|savings
+    txn ACCOUNT AMOUNT YYYY-MM-DD
+    interest ACCOUNT
+    close-month YYYY-MM
+
+Blank lines and lines starting with # are ignored.
+"""
+from collections import namedtuple
+from datetime import datetime
+import logging
+import time
+
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError
+from money import parse_dollars
+
+BatchError = namedtuple("BatchError", ["line", "command", "message"])
+BatchReport = namedtuple("BatchReport", ["commands", "errors", "seconds", "commands_per_second"])
+
+
+class BatchRunner:
+    """Runs batch commands against a bank, committing once per commit_every writes."""
+    def __init__(self, bank, session, commit_every=500):
+        self._bank = bank
+        self._session = session
+        self._commit_every = max(1, commit_every)
+        #command name to (method, number of arguments)
+        self._commands = {
+            "open": (self._open, 1),
+            "txn": (self._txn, 3),
+            "interest": (self._interest, 1),
+            "close-month": (self._close_month, 1),
+        }
+        #txn commands waiting to be posted together, as (line number, line, account, amount, date)
+        self._pending = []
+        self._opened = 0
+        self._errors = []
+
+    def run(self, lines):
+        """Runs every command in lines and returns a BatchReport; a failing command is recorded and skipped."""
+        started = time.perf_counter()
+        commands = 0
+        number = 0
+        for number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            commands += 1
+            name, *args = line.split()
+            try:
+                if name not in self._commands:
+                    raise ValueError(f"Unknown command {name!r}.")
+                command, arity = self._commands[name]
+                if len(args) != arity:
+                    raise ValueError(f"{name} takes {arity} argument{'s' if arity > 1 else ''}.")
+                command(number, line, *args)
+            except ValueError as e:
+                self._errors.append(BatchError(number, line, str(e)))
+            except (OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError) as e:
+                self._errors.append(BatchError(number, line, e.message))
+        try:
+            self._flush()
+            self._session.commit()
+        except ConcurrentUpdateError as e:
+            self._errors.append(BatchError(number + 1, "(end of input)", e.message))
+        seconds = time.perf_counter() - started
+        rate = commands / seconds if seconds > 0 else 0.0
+        errors = sorted(self._errors)
+        logging.debug("Ran batch: %d commands, %d errors, %.1f commands/s", commands, len(errors), rate)
+        return BatchReport(commands, errors, seconds, rate)
+
+    def _flush(self):
+        """Commits the opened accounts, then posts the pending txn commands one committed chunk at a time."""
+        #opened accounts are committed first, so a retried chunk of postings can't roll them back
+        if self._opened:
+            self._session.commit()
+            self._opened = 0
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self._commit_every):
+            chunk = pending[start:start + self._commit_every]
+            batch = [(account, amount, date) for _, _, account, amount, date in chunk]
+            try:
+                results = self._bank.add_transactions(batch, self._session, chunk_size=self._commit_every)
+            except (ConcurrentUpdateError, ValueError) as e:
+                #the chunk was rolled back, while the chunks before it stay committed; the error is
+                #charged to the chunk's own lines, not to the command that happened to flush it
+                message = e.message if isinstance(e, ConcurrentUpdateError) else str(e)
+                self._errors.extend(BatchError(number, line, message) for number, line, *_ in chunk)
+                continue
+            for (number, line, *_), result in zip(chunk, results):
+                if not result.accepted:
+                    self._errors.append(BatchError(number, line, result.reason))
+
+    def _account(self, account_number):
+        account = self._bank.get_account(_parse(int, account_number, "account number"))
+        if account is None:
+            raise ValueError("No such account.")
+        return account
+
+    def _open(self, number, line, account_type):
+        if account_type not in ("checking", "savings"):
+            raise ValueError("Account type must be checking or savings.")
+        self._flush()
+        self._bank.open_account(account_type, self._session)
+        self._opened += 1
+        if self._opened >= self._commit_every:
+            self._flush()
+
+    def _txn(self, number, line, account_number, amount, date):
+        account_number = _parse(int, account_number, "account number")
+        amount = _parse(parse_dollars, amount, "dollar amount")
+        date = _parse(lambda text: datetime.strptime(text, "%Y-%m-%d").date(), date, "date (YYYY-MM-DD)")
+        self._pending.append((number, line, account_number, amount, date))
+        if len(self._pending) >= self._commit_every:
+            self._flush()
+
+    def _interest(self, number, line, account_number):
+        account = self._account(account_number)
+        self._flush()
+        if account.count_transactions() == 0:
+            raise ValueError("Interest needs at least one transaction.")
+        self._bank.apply_interest_and_fees(account, self._session)
+
+    def _close_month(self, number, line, month):
+        month = _parse(lambda text: datetime.strptime(text, "%Y-%m"), month, "month (YYYY-MM)")
+        self._flush()
+        self._bank.close_month(month.year, month.month, self._session)
+
+
+def _parse(convert, text, description):
+    try:
+        return convert(text)
+    except ValueError:
+        raise ValueError(f"{text!r} is not a valid {description}.") from None
@@ -0,0 +1,4 @@
+"""Synthetic data generation and timing of the bank's hot paths.
+
+Run from the repository root, e.g. ``python -m benchmarks.run --scales 1000x20``.
+"""
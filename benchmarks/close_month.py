@@ -0,0 +1,72 @@
+"""Times Bank.close_month sequentially and with 2, 4, ... worker processes on copies of one synthetic
+database, checks that every run wrote identical rows, and prints the speedups as JSON."""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from database import make_session_factory
+from bank import Bank
+from benchmarks.generate import generate
+
+
+def _close(path, year, month, workers):
+    Session = make_session_factory(path)
+    with Session() as session:
+        result = Bank.close_month(session.query(Bank).first(), year, month, session, workers=workers)
+    Session.kw["bind"].dispose()
+    return result
+
+
+def _contents(path):
+    with sqlite3.connect(path) as connection:
+        transactions = connection.execute("SELECT _id, _amount, _date, _typeof, _account_id FROM transactions ORDER BY _id").fetchall()
+        accounts = connection.execute("SELECT _account_number, _balance FROM account ORDER BY _account_number").fetchall()
+    return transactions, accounts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=5000)
+    parser.add_argument("--transactions", type=int, default=50, help="transactions per account")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1} | {2 ** i for i in range(1, 8) if 2 ** i <= (os.cpu_count() or 1)}))
+    parser.add_argument("--month", default="2100-01", help="YYYY-MM to close, after all generated activity by default")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    year, month = (int(part) for part in args.month.split("-"))
+
+    report = {"accounts": args.accounts, "transactions_per_account": args.transactions, "cpus": os.cpu_count(), "runs": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, "source.db")
+        generate(source, args.accounts, args.transactions)
+        expected = None
+        for workers in args.workers:
+            path = os.path.join(workdir, f"close-{workers}.db")
+            shutil.copy(source, path)
+            result = _close(path, year, month, workers)
+            contents = _contents(path)
+            if expected is None:
+                expected = contents
+            report["runs"].append({
+                "workers": workers,
+                "seconds": result.seconds,
+                "accounts_per_second": result.accounts_per_second,
+                "processed": result.processed,
+                "speedup": report["runs"][0]["seconds"] / result.seconds if report["runs"] else 1.0,
+                "identical_to_first": contents == expected,
+            })
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0 if all(run["identical_to_first"] for run in report["runs"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
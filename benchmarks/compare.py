@@ -0,0 +1,43 @@
+"""Compares two JSON reports from benchmarks.run and flags operations that got slower."""
+import argparse
+import json
+import sys
+
+
+def _index(report):
+    return {(r["operation"], r["accounts"], r["transactions_per_account"]): r for r in report["results"]}
+
+
+def compare(baseline, candidate, threshold):
+    """Prints the mean time ratio per operation and returns the keys that regressed past threshold."""
+    regressions = []
+    baseline_results = _index(baseline)
+    for key, result in sorted(_index(candidate).items()):
+        if key not in baseline_results:
+            continue
+        before = baseline_results[key]["mean_ms"]
+        after = result["mean_ms"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  <-- slower"
+        print(f"{key[0]:<32} {key[1]:>8}x{key[2]:<6} {before:10.3f}ms -> {after:10.3f}ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 means 20%%")
+    args = parser.parse_args(argv)
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.candidate) as file:
+        candidate = json.load(file)
+    return 1 if compare(baseline, candidate, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Exports a synthetic database of millions of transactions to each file format and prints the
+rows/second, file size and peak memory of every export as JSON.
+
+Each export runs in a fresh process, with SQLite's memory-mapped I/O off so that database pages
+don't count towards its peak resident memory.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import generate
+
+
+def _export(database, path, chunk_size):
+    from database import make_session_factory
+    from exporter import export_transactions
+    Session = make_session_factory(database, mmap_size=0)
+    started = time.perf_counter()
+    with Session() as session:
+        written = export_transactions(session, path, chunk_size=chunk_size)
+    seconds = time.perf_counter() - started
+    Session.kw["bind"].dispose()
+    #ru_maxrss is in KiB on Linux
+    return written, seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=100, help="transactions per account")
+    parser.add_argument("--formats", nargs="+", default=["csv", "csv.gz", "jsonl", "jsonl.gz"])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--database", help="export this database instead of generating one")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    report = {"runs": []}
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as workdir:
+        database = args.database
+        if database is None:
+            database = os.path.join(workdir, "export.db")
+            generate(database, args.accounts, args.transactions)
+        report["database_mb"] = os.path.getsize(database) / 2 ** 20
+        for fmt in args.formats:
+            path = os.path.join(workdir, f"transactions.{fmt}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                written, seconds, peak_rss_mb = executor.submit(_export, database, path, args.chunk_size).result()
+            report["runs"].append({
+                "format": fmt,
+                "rows": written,
+                "seconds": seconds,
+                "rows_per_second": written / seconds if seconds > 0 else 0.0,
+                "file_mb": os.path.getsize(path) / 2 ** 20,
+                "peak_rss_mb": peak_rss_mb,
+            })
+            os.remove(path)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Builds synthetic bank.db files with N accounts and about M transactions per account."""
+from datetime import date, timedelta
+import argparse
+import random
+import sys
+
+from sqlalchemy import insert
+
+from database import make_session_factory
+from checking_account import Checking
+from savings_account import Savings
+from bank import Bank
+from account import Account
+from transaction import Transaction
+from balance_snapshot import rebuild_balance_snapshots
+
+
+def _month_end(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1) - timedelta(days=1)
+
+
+def _interest_rows(account_type, balance, last_day):
+    """Applies the same month-end rules as Checking and Savings.apply_interest_and_fees."""
+    account_class = Savings if account_type == "savings" else Checking
+    return [(amount, last_day, typeof) for amount, typeof in account_class.interest_and_fees(balance)]
+
+
+def _transaction_dates(account_type, count, start, rng):
+    """Returns count sorted posting dates; savings dates stay within 2 per day and 5 per month."""
+    dates = []
+    day = start
+    while len(dates) < count:
+        if account_type == "savings":
+            month_days = sorted(rng.sample(range(1, 29), rng.randint(1, 5)))
+            dates.extend(date(day.year, day.month, d) for d in month_days)
+            day = _month_end(day) + timedelta(days=1)
+        else:
+            day += timedelta(days=int(rng.expovariate(1 / 2.5)))
+            dates.append(day)
+    return dates[:count]
+
+
+def _account_rows(account_number, account_type, count, start, rng):
+    rows = []
+    balance = 0
+    current_month = None
+    for day in _transaction_dates(account_type, count, start, rng):
+        if current_month is not None and (day.year, day.month) != current_month:
+            for amount, posted, typeof in _interest_rows(account_type, balance, _month_end(date(*current_month, 1))):
+                balance += amount
+                rows.append((amount, posted, typeof))
+        current_month = (day.year, day.month)
+        if balance > 2000 and rng.random() < 0.4:
+            amount = -rng.randint(100, balance // 2)
+        else:
+            amount = rng.randint(1000, 50000)
+        balance += amount
+        rows.append((amount, day, "normal"))
+    return rows, balance
+
+
+def generate(path, accounts, transactions_per_account, savings_share=0.4, start=date(2020, 1, 1), seed=0, chunk_size=5000):
+    """Writes a bank with the given number of accounts to a fresh database at path."""
+    rng = random.Random(seed)
+    Session = make_session_factory(path)
+    with Session() as session:
+        bank = Bank()
+        bank._number_accounts_opened = accounts
+        session.add(bank)
+        session.commit()
+        account_rows = []
+        transaction_rows = []
+        for account_number in range(1, accounts + 1):
+            account_type = "savings" if rng.random() < savings_share else "checking"
+            rows, balance = _account_rows(account_number, account_type, transactions_per_account, start, rng)
+            interest_days = [day for _, day, typeof in rows if typeof == "interest"]
+            account_rows.append({"_account_number": account_number, "_bank_id": bank._id,
+                                 "_balance": balance, "_type": account_type,
+                                 "_latest_transaction_date": rows[-1][1] if rows else None,
+                                 "_last_interest_date": interest_days[-1] if interest_days else None})
+            transaction_rows.extend({"_amount": amount, "_date": day, "_typeof": typeof, "_account_id": account_number}
+                                    for amount, day, typeof in rows)
+            if len(transaction_rows) >= chunk_size:
+                session.execute(insert(Account.__table__), account_rows)
+                session.execute(insert(Transaction.__table__), transaction_rows)
+                session.commit()
+                account_rows, transaction_rows = [], []
+        if account_rows:
+            session.execute(insert(Account.__table__), account_rows)
+        if transaction_rows:
+            session.execute(insert(Transaction.__table__), transaction_rows)
+        rebuild_balance_snapshots(session.connection())
+        session.commit()
+    Session.kw["bind"].dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("path")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=50, help="transactions per account")
+    parser.add_argument("--savings-share", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    generate(args.path, args.accounts, args.transactions, args.savings_share, seed=args.seed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
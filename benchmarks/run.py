@@ -0,0 +1,214 @@
+"""Times the bank's hot paths against synthetic databases and prints the results as JSON.
+
+Each scale is written as ACCOUNTSxTRANSACTIONS, e.g. ``--scales 100x20 1000x50``.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import sqlalchemy
+
+from database import make_session_factory
+from bank import Bank
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError
+from log_config import configure_logging, LOG_FORMAT, DATE_FORMAT
+from benchmarks.generate import generate
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _summarize(operation, scale, samples):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "operation": operation,
+        "accounts": scale[0],
+        "transactions_per_account": scale[1],
+        "iterations": len(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "p50_ms": samples_ms[len(samples_ms) // 2],
+        "p95_ms": samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))],
+        "total_s": sum(samples_ms) / 1000,
+    }
+
+
+def _time_calls(calls):
+    samples = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_open_account(Session, iterations):
+    with Session() as session:
+        bank = session.query(Bank).first()
+
+        def open_account():
+            bank.open_account(random.choice(["checking", "savings"]), session)
+            session.commit()
+        return _time_calls([open_account] * iterations)
+
+
+def bench_get_account(Session, accounts, iterations, rng):
+    with Session() as session:
+        bank = session.query(Bank).first()
+        numbers = [rng.randint(1, accounts) for _ in range(iterations)]
+        return _time_calls([lambda number=number: bank.get_account(number) for number in numbers])
+
+
+def bench_add_transaction(Session, accounts, iterations, rng):
+    with Session() as session:
+        bank = session.query(Bank).first()
+        targets = [bank.get_account(rng.randint(1, accounts)) for _ in range(iterations)]
+        #every posting gets a later date than anything generated, so only savings limits can reject it
+        days = [date(2100, 1, 1) + timedelta(days=i) for i in range(iterations)]
+
+        def post(account, day):
+            try:
+                bank.add_transaction(account, Decimal('10.00'), day, session)
+            except (OverdrawError, TransactionSequenceError, TransactionLimitError):
+                pass
+        return _time_calls([lambda account=account, day=day: post(account, day) for account, day in zip(targets, days)])
+
+
+def bench_apply_interest_and_fees(Session, accounts, iterations, rng):
+    with Session() as session:
+        bank = session.query(Bank).first()
+        targets = [bank.get_account(number) for number in rng.sample(range(1, accounts + 1), min(iterations, accounts))]
+
+        def apply(account):
+            try:
+                bank.apply_interest_and_fees(account, session)
+            except TransactionLimitError:
+                pass
+        return _time_calls([lambda account=account: apply(account) for account in targets])
+
+
+def bench_cli_startup(path, iterations):
+    """Times a fresh interpreter importing the CLI, opening the database and loading the bank."""
+    script = ("import sys; sys.path.insert(0, %r); import cli; from database import make_session_factory; "
+              "cli.Session = make_session_factory(%r); cli.BankCLI()") % (REPO_ROOT, path)
+
+    def start():
+        subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, timeout=600)
+    return _time_calls([start] * iterations)
+
+
+def bench_transaction_list_refresh(Session, accounts, iterations, rng):
+    """Times TransactionListFrame.refresh, or returns None when no display is available."""
+    try:
+        import tkinter as tk
+        from megawidgets import TransactionListFrame
+        window = tk.Tk()
+    except Exception:
+        return None
+    try:
+        with Session() as session:
+            bank = session.query(Bank).first()
+            frame = TransactionListFrame(window, session, bank)
+            frame.pack()
+            frame.set_selected_account(bank.get_account(rng.randint(1, accounts)))
+
+            def refresh():
+                frame.refresh()
+                window.update_idletasks()
+            return _time_calls([refresh] * iterations)
+    finally:
+        window.destroy()
+
+
+def bench_logging(workdir, iterations):
+    """Times a posting-style debug call written straight to a file and through the background queue."""
+    direct = logging.getLogger("benchmarks.direct")
+    direct.propagate = False
+    direct.setLevel(logging.DEBUG)
+    handler = logging.FileHandler(os.path.join(workdir, "direct.log"))
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+    direct.addHandler(handler)
+    queued = logging.getLogger("benchmarks.queued")
+    queued.propagate = False
+    listener = configure_logging(os.path.join(workdir, "queued.log"), logger=queued)
+    amount = Decimal('3.97700000000000')
+    try:
+        return {
+            "logging.debug direct": _time_calls([lambda: direct.debug("Created transaction: %s, %s", 1, amount)] * iterations),
+            "logging.debug queued": _time_calls([lambda: queued.debug("Created transaction: %s, %s", 1, amount)] * iterations),
+        }
+    finally:
+        listener.stop()
+        handler.close()
+
+
+def run_scale(scale, workdir, iterations, seed):
+    accounts, transactions = scale
+    path = os.path.join(workdir, f"bank-{accounts}x{transactions}.db")
+    started = time.perf_counter()
+    generate(path, accounts, transactions, seed=seed)
+    results = [_summarize("generate", scale, [time.perf_counter() - started])]
+    rng = random.Random(seed)
+    Session = make_session_factory(path)
+    results.append(_summarize("Bank.get_account", scale, bench_get_account(Session, accounts, iterations, rng)))
+    results.append(_summarize("Bank.add_transaction", scale, bench_add_transaction(Session, accounts, iterations, rng)))
+    results.append(_summarize("Bank.apply_interest_and_fees", scale, bench_apply_interest_and_fees(Session, accounts, iterations, rng)))
+    results.append(_summarize("Bank.open_account", scale, bench_open_account(Session, iterations)))
+    refresh = bench_transaction_list_refresh(Session, accounts, iterations, rng)
+    if refresh is not None:
+        results.append(_summarize("TransactionListFrame.refresh", scale, refresh))
+    Session.kw["bind"].dispose()
+    results.append(_summarize("cli startup", scale, bench_cli_startup(path, max(1, iterations // 20))))
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _parse_scale(text):
+    accounts, transactions = text.lower().split("x")
+    return int(accounts), int(transactions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", nargs="+", type=_parse_scale, default=[(100, 20), (1000, 50)])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            report["results"].extend(run_scale(scale, workdir, args.iterations, args.seed))
+        for operation, samples in bench_logging(workdir, args.iterations * 10).items():
+            report["results"].append(_summarize(operation, (0, 0), samples))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Starts the bank service on a synthetic database, drives it with concurrent clients and prints
+requests/second and latency percentiles, overall and per operation, as JSON."""
+from datetime import date, timedelta
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from client import AsyncBankClient
+from errors import ServiceError
+from benchmarks.generate import generate
+from benchmarks.run import REPO_ROOT
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def _summarize(samples):
+    samples_ms = sorted(sample * 1000 for sample in samples)
+    return {"requests": len(samples_ms), "p50_ms": _percentile(samples_ms, 0.5), "p99_ms": _percentile(samples_ms, 0.99)}
+
+
+async def _client(socket_path, accounts, requests, write_share, seed, samples, rejected):
+    rng = random.Random(seed)
+    client = await AsyncBankClient.connect(socket_path)
+    try:
+        for i in range(requests):
+            account = rng.randint(1, accounts)
+            roll = rng.random()
+            if roll < write_share:
+                op = "post_transaction"
+                call = client.post_transaction(account, f"{rng.randint(1, 500)}.00", date(2100, 1, 1) + timedelta(days=i))
+            elif roll < write_share + (1 - write_share) / 2:
+                op = "get_account"
+                call = client.get_account(account)
+            else:
+                op = "list_transactions"
+                call = client.list_transactions(account, limit=50)
+            started = time.perf_counter()
+            try:
+                await call
+            except ServiceError:
+                rejected[op] = rejected.get(op, 0) + 1
+            samples.setdefault(op, []).append(time.perf_counter() - started)
+    finally:
+        await client.close()
+
+
+async def _drive(socket_path, accounts, clients, requests, write_share):
+    samples = {}
+    rejected = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(socket_path, accounts, requests, write_share, seed, samples, rejected)
+                           for seed in range(clients)))
+    return time.perf_counter() - started, samples, rejected
+
+
+def _wait_for(socket_path, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError("The bank service did not start.")
+        time.sleep(0.05)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--transactions", type=int, default=20, help="transactions per account")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--write-share", type=float, default=0.2, help="fraction of requests that post a transaction")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "service.db")
+        socket_path = os.path.join(workdir, "bank.sock")
+        generate(path, args.accounts, args.transactions)
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "service.py"), "--socket", socket_path,
+                                    "--database", path, "--readers", str(args.readers)], cwd=workdir)
+        try:
+            _wait_for(socket_path, process)
+            seconds, samples, rejected = asyncio.run(
+                _drive(socket_path, args.accounts, args.clients, args.requests, args.write_share))
+        finally:
+            process.terminate()
+            process.wait()
+
+    every = [sample for op_samples in samples.values() for sample in op_samples]
+    report = dict(_summarize(every), clients=args.clients, seconds=seconds, requests_per_second=len(every) / seconds,
+                  operations={op: dict(_summarize(op_samples), rejected=rejected.get(op, 0))
+                              for op, op_samples in sorted(samples.items())})
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
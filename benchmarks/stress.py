@@ -0,0 +1,112 @@
+"""Posts deposits to a few shared accounts and opens accounts from several processes at once, then
+checks that no posting or account number was lost and prints the throughput and conflicts as JSON."""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+
+def _worker(path, seed, accounts, postings, opens):
+    from database import make_session_factory
+    from bank import Bank
+    import concurrency
+    rng = random.Random(seed)
+    Session = make_session_factory(path)
+    opened = []
+    started = time.perf_counter()
+    with Session() as session:
+        bank = session.query(Bank).first()
+        for i in range(postings):
+            account = bank.get_account(rng.randint(1, accounts))
+            bank.add_transaction(account, "1.00", date(2024, 1, 1), session)
+            if opens and i % (postings // opens or 1) == 0 and len(opened) < opens:
+                opened.append(bank.open_account("checking", session).get_account_number())
+                session.commit()
+        while len(opened) < opens:
+            opened.append(bank.open_account("checking", session).get_account_number())
+            session.commit()
+    seconds = time.perf_counter() - started
+    Session.kw["bind"].dispose()
+    return seconds, opened, dict(concurrency.conflict_counts)
+
+
+def _setup(path, accounts):
+    from database import make_session_factory
+    from bank import Bank
+    Session = make_session_factory(path)
+    with Session() as session:
+        bank = Bank()
+        session.add(bank)
+        session.commit()
+        for _ in range(accounts):
+            bank.open_account("checking", session)
+        session.commit()
+    Session.kw["bind"].dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--accounts", type=int, default=3, help="shared accounts the deposits go to")
+    parser.add_argument("--postings", type=int, default=200, help="deposits per process")
+    parser.add_argument("--opens", type=int, default=10, help="accounts opened per process")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "stress.db")
+        _setup(path, args.accounts)
+        started = time.perf_counter()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=args.processes, mp_context=context) as executor:
+            futures = [executor.submit(_worker, path, seed, args.accounts, args.postings, args.opens)
+                       for seed in range(args.processes)]
+            outcomes = [future.result() for future in futures]
+        seconds = time.perf_counter() - started
+
+        with sqlite3.connect(path) as connection:
+            total = connection.execute("SELECT COALESCE(SUM(_balance), 0) FROM account").fetchone()[0]
+            mismatched = connection.execute(
+                "SELECT COUNT(*) FROM account WHERE _balance != (SELECT COALESCE(SUM(_amount), 0) FROM transactions "
+                "WHERE transactions._account_id = account._account_number)").fetchone()[0]
+            stale_snapshots = connection.execute(
+                "SELECT COUNT(*) FROM account WHERE _balance != COALESCE((SELECT _balance FROM balance_snapshots "
+                "WHERE _account_id = account._account_number ORDER BY _month DESC LIMIT 1), 0)").fetchone()[0]
+            opened_counter, account_rows = connection.execute(
+                "SELECT _number_accounts_opened, (SELECT COUNT(*) FROM account) FROM bank").fetchone()
+
+    opened = [number for _, numbers, _ in outcomes for number in numbers]
+    conflicts = {}
+    for _, _, counts in outcomes:
+        for kind, count in counts.items():
+            conflicts[kind] = conflicts.get(kind, 0) + count
+    expected_accounts = args.accounts + args.processes * args.opens
+    report = {
+        "processes": args.processes,
+        "postings": args.processes * args.postings,
+        "seconds": seconds,
+        "postings_per_second": args.processes * args.postings / seconds,
+        "conflicts": conflicts,
+        "balance_cents": total,
+        "expected_balance_cents": args.processes * args.postings * 100,
+        "balances_match_ledgers": mismatched == 0,
+        "balances_match_snapshots": stale_snapshots == 0,
+        "accounts": account_rows,
+        "expected_accounts": expected_accounts,
+        "account_numbers_unique": len(set(opened)) == len(opened) and opened_counter == expected_accounts,
+    }
+    print(json.dumps(report, indent=2))
+    ok = (total == report["expected_balance_cents"] and mismatched == 0 and stale_snapshots == 0
+          and account_rows == expected_accounts
+          and report["account_numbers_unique"])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
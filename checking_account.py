@@ -1,7 +1,12 @@
 from account import Account
-from decimal import Decimal
+from money import apply_rate, format_cents
 from errors import *
 
+#monthly interest of 0.08%, and a $5.44 fee when the balance is under $100, all in cents
+INTEREST_RATE = (8, 10000)
+LOW_BALANCE_FEE = 544
+LOW_BALANCE_THRESHOLD = 10000
+
 class Checking(Account):
 
     __mapper_args__ = {
@@ -15,16 +20,24 @@ class Checking(Account):
     def apply_interest_and_fees(self, session):
         """Applies interest and fee calculation on account"""
         if self._has_interest_been_applied():
-            raise TransactionLimitError(latest_date = max(self._transactions).get_date())
+            raise TransactionLimitError(latest_date = self._get_latest_date())
         last_day = self._get_last_day_of_month()
-        self.add_transaction(self._balance * Decimal('0.0008'), last_day, "interest", session)
+        self._post_interest_and_fees(last_day, session)
+        session.commit()
+
+    @staticmethod
+    def interest_and_fees(balance):
+        """Returns the (amount, type) postings in cents that month end produces for a balance in cents."""
+        interest = apply_rate(balance, *INTEREST_RATE)
+        postings = [(interest, "interest")]
         #for checking accounts, check overdraft
-        if (self._balance < Decimal(100)):
-            self.add_transaction(Decimal('-5.44'), last_day, "fees", session)
+        if (balance + interest < LOW_BALANCE_THRESHOLD):
+            postings.append((-LOW_BALANCE_FEE, "fees"))
+        return postings
 
     def __str__(self):
         """String representation of the account."""
-        return f"Checking#{self._account_number:09d},\tbalance: ${self._balance:,.2f}"
+        return f"Checking#{self._account_number:09d},\tbalance: {format_cents(self._balance)}"
 
 
     
\ No newline at end of file
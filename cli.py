@@ -1,15 +1,16 @@
-
-from sqlalchemy import create_engine
-from sqlalchemy.orm.session import sessionmaker
-from sqlalchemy import create_engine
-
-
-from database import Base
-from decimal import Decimal, InvalidOperation
+from database import make_session_factory
 from bank import Bank
 from datetime import datetime
 from account import Account
-from errors import OverdrawError, TransactionSequenceError, TransactionLimitError
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError
+from importer import read_transactions
+from batch import BatchRunner
+from exporter import export_transactions
+from balance_snapshot import rebuild_balance_snapshots
+from instrumentation import metrics
+from log_config import configure_logging
+from money import parse_dollars
+import argparse
 import sys
 import logging
 
@@ -37,9 +38,26 @@ class BankCLI:
             "4": self._add_transaction,
             "5": self._list_transactions,
             "6": self._interest_and_fees,
-            "7": self._quit
+            "7": self._import_transactions,
+            "8": self._close_month,
+            "9": self._metrics,
+            "10": self._export_transactions,
+            "11": self._quit
         }
     
+    def run_batch(self, path, commit_every=500):
+        """Run the commands in a batch file, or stdin when path is '-', and print a report. Returns 1 if any command failed."""
+        if path == "-":
+            report = BatchRunner(self._bank, self._session, commit_every).run(sys.stdin)
+        else:
+            with open(path) as file:
+                report = BatchRunner(self._bank, self._session, commit_every).run(file)
+        for error in report.errors:
+            print(f"Line {error.line} ({error.command}): {error.message}")
+        print(f"Ran {report.commands} commands with {len(report.errors)} errors in {report.seconds:.2f}s "
+              f"({report.commands_per_second:,.0f} commands/s).")
+        return 1 if report.errors else 0
+
     def _display_menu(self):
         if self._selected_account:
             account_info = str(self._selected_account)
@@ -55,7 +73,11 @@ Enter command
 4: add transaction
 5: list transactions
 6: interest and fees
-7: quit""")
+7: import transactions
+8: close month
+9: metrics
+10: export transactions
+11: quit""")
         
     def run(self):
         """Display the menu and respond to choices."""
@@ -83,15 +105,16 @@ Enter command
     def _select_account(self):
         account_number = input("Enter account number\n>")
         self._selected_account = self._bank.get_account(account_number)
+        self._bank.pin_account(self._selected_account)
 
     def _add_transaction(self):
         try:
             while True:
                 amount_str = input("Amount?\n>")
                 try:
-                    amount = Decimal(amount_str)
+                    amount = parse_dollars(amount_str)
                     break  
-                except InvalidOperation:
+                except ValueError:
                     print("Please try again with a valid dollar amount.")
 
             while True:
@@ -112,6 +135,8 @@ Enter command
             print(e.message)
         except TransactionSequenceError as e:
             print(e.message)
+        except ConcurrentUpdateError as e:
+            print(e.message)
 
     def _list_transactions(self):
         try:
@@ -129,24 +154,115 @@ Enter command
             print("This command requires that you first select an account.")
         except TransactionLimitError as e:
             print(e.message)
+        except ConcurrentUpdateError as e:
+            print(e.message)
             
+
+    def _import_transactions(self):
+        path = input("File to import? (.csv or .jsonl, optionally .gz)\n>")
+        try:
+            batch = read_transactions(path)
+        except OSError:
+            print("Could not open that file.")
+            return
+        except ValueError as e:
+            print(e)
+            return
+        try:
+            results = self._bank.add_transactions(batch, self._session)
+        except ConcurrentUpdateError as e:
+            #chunks before the one that gave up stay committed
+            print(e.message)
+            return
+        for result in results:
+            if not result.accepted:
+                print(f"Row {result.row} (account {result.account_number}): {result.reason}")
+        print(f"Imported {sum(result.accepted for result in results)} of {len(results)} transactions.")
+        logging.debug("Saved to bank.db")
+
+    def _close_month(self):
+        while True:
+            month_str = input("Month? (YYYY-MM)\n>")
+            try:
+                month = datetime.strptime(month_str, "%Y-%m")
+                break
+            except ValueError:
+                print("Please try again with a valid month in the format YYYY-MM.")
+        try:
+            result = self._bank.close_month(month.year, month.month, self._session)
+        except ConcurrentUpdateError as e:
+            #closed chunks stay committed and are skipped when the month is closed again
+            print(e.message)
+            return
+        logging.debug("Saved to bank.db")
+        print(f"Closed {month_str}: {result.processed} accounts processed, {result.skipped} skipped "
+              f"({result.accounts_per_second:,.0f} accounts/s).")
+
+    def _export_transactions(self):
+        path = input("File to export to? (.csv or .jsonl, add .gz to compress)\n>")
+        account_number = None
+        while True:
+            account_str = input("Account number? (leave blank for every account)\n>")
+            try:
+                account_number = int(account_str) if account_str else None
+                break
+            except ValueError:
+                print("Please try again with a valid account number.")
+        dates = []
+        for prompt in ("From date? (YYYY-MM-DD, or leave blank)", "To date? (YYYY-MM-DD, or leave blank)"):
+            while True:
+                date_str = input(f"{prompt}\n>")
+                try:
+                    dates.append(datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else None)
+                    break
+                except ValueError:
+                    print("Please try again with a valid date in the format YYYY-MM-DD.")
+        try:
+            written = export_transactions(self._session, path, account_number, *dates, bank_id=self._bank._id)
+        except OSError:
+            print("Could not write that file.")
+            return
+        print(f"Exported {written} transactions to {path}.")
+
+    def _metrics(self):
+        print(metrics.report())
+        stats = self._bank.account_cache_stats()
+        print(f"Account cache: {stats.hits} hits, {stats.misses} misses, {stats.evictions} evictions, "
+              f"{stats.accounts}/{stats.max_accounts} accounts, {stats.transactions}/{stats.max_transactions} transactions")
+        path = input("Save metrics to file? (path, or leave blank)\n>")
+        if path:
+            metrics.dump(path)
+            print(f"Saved metrics to {path}.")
         
     def _quit(self):
         sys.exit(0)
 
 if __name__ == "__main__":
 
-    engine = create_engine(f"sqlite:///bank.db")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(engine) 
+    parser = argparse.ArgumentParser(description="Bank command line interface.")
+    parser.add_argument("--batch", metavar="FILE", help="run the commands in FILE (- for stdin) instead of showing the menu")
+    parser.add_argument("--commit-every", type=int, default=500, metavar="N", help="commit batch writes N at a time")
+    parser.add_argument("--database", default="bank.db")
+    parser.add_argument("--rebuild-snapshots", action="store_true", help="rebuild the monthly balance snapshots from the transaction history and exit")
+    args = parser.parse_args()
+
+    configure_logging('bank.log')
+    Session = make_session_factory(args.database)
+    metrics.attach(Session.kw["bind"])
 
-    logging.basicConfig(filename='bank.log', level=logging.DEBUG,
-                    format='%(asctime)s|%(levelname)s|%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     try:
+        if args.rebuild_snapshots:
+            with Session.kw["bind"].begin() as connection:
+                written = rebuild_balance_snapshots(connection)
+            logging.debug("Rebuilt %s balance snapshots", written)
+            print(f"Rebuilt {written} balance snapshots.")
+            sys.exit(0)
+        if args.batch:
+            sys.exit(BankCLI().run_batch(args.batch, args.commit_every))
         BankCLI().run()
     except Exception as e:
         error_message = str(e).replace('\n', '\\n')
-        logging.error(f"{type(e).__name__}: '{error_message}'")
+        logging.error("%s: '%s'", type(e).__name__, error_message)
         print("Sorry! Something unexpected happened. Check the logs or contact the developer for assistance.")
         sys.exit(0)
 
@@ -0,0 +1,107 @@
+"""Clients for the bank service in service.py; they only need the standard library, so they start quickly.
+
+BankClient makes blocking calls over one connection; AsyncBankClient does the same from asyncio
+code. Both raise ServiceError with the service's message when a request fails. Amounts are
+returned in integer cents.
+"""
+import asyncio
+import itertools
+import json
+import socket
+
+from errors import ServiceError
+
+
+def _request(op, **arguments):
+    return dict(arguments, op=op)
+
+
+def _result(response):
+    if not response.get("ok"):
+        raise ServiceError(response.get("error"), response.get("type"))
+    return response["result"]
+
+
+class _Operations:
+    """The service's operations, built on the subclass's call(op, **arguments)."""
+    def open_account(self, account_type):
+        return self.call("open_account", type=account_type)
+
+    def post_transaction(self, account_number, amount, date):
+        """Posts a dollar amount, given as a string or Decimal so no cents are lost, on a date."""
+        return self.call("post_transaction", account=account_number, amount=str(amount), date=date.isoformat())
+
+    def list_transactions(self, account_number, start=None, end=None, offset=0, limit=None):
+        return self.call("list_transactions", account=account_number, start=start and start.isoformat(),
+                         end=end and end.isoformat(), offset=offset, limit=limit)
+
+    def apply_interest(self, account_number):
+        return self.call("apply_interest", account=account_number)
+
+    def get_account(self, account_number):
+        return self.call("get_account", account=account_number)
+
+    def ping(self):
+        return self.call("ping")
+
+
+class BankClient(_Operations):
+    """Blocking client for a service listening on socket_path, or on host:port."""
+    def __init__(self, socket_path=None, port=None, host="127.0.0.1"):
+        if socket_path:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+        else:
+            self._socket = socket.create_connection((host, port))
+        self._file = self._socket.makefile("rwb")
+        self._ids = itertools.count(1)
+
+    def call(self, op, **arguments):
+        request = _request(op, id=next(self._ids), **arguments)
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The bank service closed the connection.")
+        return _result(json.loads(line))
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncBankClient(_Operations):
+    """Asyncio client; create it with ``await AsyncBankClient.connect(...)``. Calls on one client run one at a time."""
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def connect(cls, socket_path=None, port=None, host="127.0.0.1"):
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, op, **arguments):
+        async with self._lock:
+            request = _request(op, id=next(self._ids), **arguments)
+            self._writer.write(json.dumps(request).encode() + b"\n")
+            await self._writer.drain()
+            line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("The bank service closed the connection.")
+        return _result(json.loads(line))
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
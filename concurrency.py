@@ -0,0 +1,64 @@
+"""Retries for writes that lose a race with another process using the same database file.
+
+Banks and accounts carry a version column, so an update based on a stale read matches no row
+and SQLAlchemy raises StaleDataError; a writer that waits longer than the busy timeout gets
+"database is locked". Both are retried after rolling back, which reloads the rows. Retries take
+the database's write lock before reading again, so a busy account can't lose the race every time.
+"""
+from collections import Counter
+import logging
+import random
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from errors import ConcurrentUpdateError
+
+ATTEMPTS = 5
+BASE_DELAY = 0.01
+MAX_DELAY = 0.5
+
+#"stale", "locked" and "gave_up" counts since the process started
+conflict_counts = Counter()
+
+
+def _conflict_kind(error):
+    if isinstance(error, StaleDataError):
+        return "stale"
+    if isinstance(error, OperationalError) and "locked" in str(error.orig):
+        return "locked"
+    return None
+
+
+def take_write_lock(session):
+    """Makes session's transaction hold SQLite's single write lock until it ends, waiting for it if needed."""
+    #a write that matches no rows still takes the lock
+    session.execute(text("UPDATE bank SET _id = _id WHERE 0"))
+
+
+def retry_on_conflict(operation, session, attempts=ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Calls operation() and returns its result, retrying it with jittered exponential backoff on a conflict.
+
+    The operation must do all of its reads and writes through session and commit them, since a
+    conflict rolls the session back before the next attempt. Raises ConcurrentUpdateError once
+    every attempt has failed.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            if attempt > 1:
+                take_write_lock(session)
+            return operation()
+        except (StaleDataError, OperationalError) as e:
+            kind = _conflict_kind(e)
+            if kind is None:
+                raise
+            session.rollback()
+            conflict_counts[kind] += 1
+            if attempt == attempts:
+                conflict_counts["gave_up"] += 1
+                raise ConcurrentUpdateError() from e
+            delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            logging.debug("Write conflict (%s), retrying in %.3fs", kind, delay)
+            time.sleep(delay)
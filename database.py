@@ -1,4 +1,65 @@
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import StaticPool
+import migrations
 
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
+
+
+#settings used by both front ends; tune these instead of the entry points
+ENGINE_DEFAULTS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -20000,
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "echo": False,
+}
+
+
+def make_engine(path="bank.db", **options):
+    """Creates a SQLite engine for the database file at path, applying the tuning pragmas on every connection.
+
+    Options override ENGINE_DEFAULTS: journal_mode, synchronous, cache_size (pages, or KiB when
+    negative), mmap_size (bytes), busy_timeout (milliseconds), and the pool_size, max_overflow and
+    pool_timeout connection pool settings. A path of ":memory:" gives an in-memory database shared
+    by every session of the engine, which is useful for tests.
+    """
+    settings = dict(ENGINE_DEFAULTS, **options)
+    if path == ":memory:":
+        engine = create_engine("sqlite://", echo=settings["echo"], poolclass=StaticPool,
+                               connect_args={"check_same_thread": False})
+        #write-ahead logging needs a file, in-memory databases keep their journal in memory
+        settings["journal_mode"] = "memory"
+    else:
+        engine = create_engine(f"sqlite:///{path}", echo=settings["echo"],
+                               pool_size=settings["pool_size"], max_overflow=settings["max_overflow"],
+                               pool_timeout=settings["pool_timeout"])
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous={settings['synchronous']}")
+        cursor.execute(f"PRAGMA cache_size={int(settings['cache_size'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings['mmap_size'])}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings['busy_timeout'])}")
+        cursor.close()
+
+    return engine
+
+
+def make_session_factory(path="bank.db", **options):
+    """Creates the engine for path, creates or migrates the tables and returns a sessionmaker bound to it."""
+    engine = make_engine(path, **options)
+    is_new = not inspect(engine).has_table("bank")
+    Base.metadata.create_all(engine)
+    if is_new:
+        migrations.stamp(engine)
+    else:
+        migrations.migrate(engine)
+    return sessionmaker(engine)
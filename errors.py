@@ -25,4 +25,17 @@ class TransactionLimitError(Exception):
             self.message = "Transaction limit error."
         super().__init__(message)
         self.daily = daily
-        self.monthly = monthly
\ No newline at end of file
+        self.monthly = monthly
+
+class ConcurrentUpdateError(Exception):
+    """Exception raised when a change keeps colliding with changes made by another process."""
+    def __init__(self, message="This account was changed by someone else at the same time. Please try again."):
+        self.message = message
+        super().__init__(self.message)
+
+class ServiceError(Exception):
+    """Exception raised by the service client when the bank service rejects a request."""
+    def __init__(self, message, kind=None):
+        self.message = message
+        self.kind = kind
+        super().__init__(self.message)
@@ -0,0 +1,103 @@
+"""Streams transactions from the database to CSV or JSON-lines files, optionally gzip-compressed.
+
+Rows are read in chunks with yield_per and written as they arrive, so memory use doesn't grow
+with the size of the table. Files use the account,amount,date,type columns that read_transactions
+reads back, with amounts in dollars.
+
+Run ``python exporter.py transactions.csv.gz`` to export the whole bank, or add ``--account``,
+``--start`` and ``--end`` to narrow it down.
+"""
+from datetime import datetime
+import argparse
+import csv
+import gzip
+import json
+import logging
+import sys
+import time
+
+from sqlalchemy import select
+
+from account import Account
+from database import make_session_factory
+from money import cents_to_dollars
+from transaction import Transaction
+
+FIELDS = ["account", "amount", "date", "type"]
+
+
+def export_transactions(session, path, account_number=None, start=None, end=None, bank_id=None,
+                        fmt=None, compress=None, chunk_size=10000):
+    """Writes the matching transactions to path in account, date order and returns how many were written.
+
+    fmt is "csv" or "jsonl" and compress is True for gzip; both default from the file name, e.g.
+    transactions.jsonl.gz. The filters are all optional: one account, dates from start to end
+    inclusive, and one bank's accounts.
+    """
+    compress = path.endswith(".gz") if compress is None else compress
+    fmt = fmt or ("jsonl" if path.removesuffix(".gz").endswith(".jsonl") else "csv")
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown export format {fmt!r}.")
+    statement = (select(Transaction._account_id, Transaction._amount, Transaction._date, Transaction._typeof)
+                 .order_by(Transaction._account_id, Transaction._date, Transaction._id)
+                 .execution_options(yield_per=chunk_size))
+    if account_number is not None:
+        statement = statement.where(Transaction._account_id == account_number)
+    if start is not None:
+        statement = statement.where(Transaction._date >= start)
+    if end is not None:
+        statement = statement.where(Transaction._date <= end)
+    if bank_id is not None:
+        statement = statement.join(Account, Account._account_number == Transaction._account_id).where(Account._bank_id == bank_id)
+
+    started = time.perf_counter()
+    written = 0
+    with (gzip.open(path, "wt", newline="") if compress else open(path, "w", newline="")) as file:
+        write_chunk = _csv_writer(file) if fmt == "csv" else _jsonl_writer(file)
+        for rows in session.execute(statement).partitions():
+            write_chunk(rows)
+            written += len(rows)
+    logging.debug("Exported %d transactions to %s in %.2fs", written, path, time.perf_counter() - started)
+    return written
+
+
+def _csv_writer(file):
+    writer = csv.writer(file)
+    writer.writerow(FIELDS)
+
+    def write_chunk(rows):
+        writer.writerows((account, cents_to_dollars(amount), day.isoformat(), typeof) for account, amount, day, typeof in rows)
+    return write_chunk
+
+
+def _jsonl_writer(file):
+    def write_chunk(rows):
+        file.writelines(json.dumps({"account": account, "amount": cents_to_dollars(amount), "date": day.isoformat(),
+                                    "type": typeof}) + "\n" for account, amount, day, typeof in rows)
+    return write_chunk
+
+
+def _date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="file to write; .jsonl for JSON lines, and .gz to compress")
+    parser.add_argument("--account", type=int)
+    parser.add_argument("--start", type=_date, help="YYYY-MM-DD")
+    parser.add_argument("--end", type=_date, help="YYYY-MM-DD")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--database", default="bank.db")
+    args = parser.parse_args(argv)
+    Session = make_session_factory(args.database)
+    with Session() as session:
+        written = export_transactions(session, args.path, args.account, args.start, args.end,
+                                      fmt=args.format, chunk_size=args.chunk_size)
+    print(f"Exported {written} transactions to {args.path}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
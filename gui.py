@@ -1,12 +1,11 @@
 
 #Developed and tested in MacOS
-from megawidgets import AccountListFrame, TransactionListFrame, OpenAccountFrame, AddTransactionFrame
-from sqlalchemy import create_engine
-from sqlalchemy.orm.session import sessionmaker
-from sqlalchemy import create_engine
-from database import Base
+from megawidgets import AccountListFrame, TransactionListFrame, OpenAccountFrame, AddTransactionFrame, set_pending
+from database import make_session_factory
+from gui_worker import DatabaseWorker
+from log_config import configure_logging
 from bank import Bank
-from errors import TransactionLimitError
+from errors import TransactionLimitError, ConcurrentUpdateError
 import sys
 import logging
 import tkinter as tk
@@ -59,6 +58,10 @@ class BankGUI:
         self._session.add(self._bank)
         self._session.commit()
 
+        #writes run on the worker thread, with its own session, so a slow commit doesn't freeze the window
+        self._worker = DatabaseWorker(self._window, Session, self._bank._id)
+        self._window.protocol("WM_DELETE_WINDOW", self._close)
+
         self._button_frame = tk.Frame(self._window, bg='#f0f0f0') 
         self._button_frame.pack(side=tk.TOP, fill=tk.X)
 
@@ -96,7 +99,7 @@ class BankGUI:
         if self._add_transaction_frame is not None:
             self._add_transaction_frame.destroy()
         
-        self._open_account_frame = OpenAccountFrame(self._window, self._session, self._bank, self._account_list_frame)
+        self._open_account_frame = OpenAccountFrame(self._window, self._session, self._worker, self._account_list_frame)
         self._open_account_frame.pack(side=tk.TOP, fill=tk.X, after=self._button_frame)
         self._account_list_frame.refresh()
 
@@ -112,26 +115,49 @@ class BankGUI:
         if self._selected_account == None:
             messagebox.showwarning("Error", "This command requires that you first select an account.")
         else:
-            self._add_transaction_frame = AddTransactionFrame(self._window, self._session, self._bank, self._selected_account, self._account_list_frame, self._transaction_list_frame)
+            self._add_transaction_frame = AddTransactionFrame(self._window, self._session, self._worker, self._selected_account, self._account_list_frame, self._transaction_list_frame)
             self._add_transaction_frame.pack(side=tk.TOP, fill=tk.X, after=self._button_frame)
             self._account_list_frame.refresh()
 
     def _apply_interest_fees(self):
-        try:
-            if len(self._selected_account.get_transactions()) >= 1:
-                self._bank.apply_interest_and_fees(self._selected_account, self._session)
+        if self._selected_account is None:
+            messagebox.showwarning("Error", "This command requires that you first select an account.")
+            return
+        account_number = self._selected_account.get_account_number()
+
+        def apply(bank, session):
+            account = bank.get_account(account_number)
+            if account.count_transactions() >= 1:
+                bank.apply_interest_and_fees(account, session)
                 logging.debug("Triggered interest and fees")
-                self._session.commit()
+                session.commit()
                 logging.debug("Saved to bank.db")
-            self._account_list_frame.refresh()
-            self._transaction_list_frame.refresh()
-        except AttributeError:
-            messagebox.showwarning("Error", "This command requires that you first select an account.")
-        except TransactionLimitError as e:
-            messagebox.showwarning("Error", e.message)
+
+        set_pending(self._apply_interest_fees_button, True)
+        self._worker.submit(apply, self._on_interest_applied, self._on_interest_failed)
+
+    def _on_interest_applied(self, result):
+        set_pending(self._apply_interest_fees_button, False)
+        #ends the read so the lists pick up what the worker committed
+        self._session.commit()
+        self._account_list_frame.refresh()
+        self._transaction_list_frame.refresh()
+
+    def _on_interest_failed(self, error):
+        set_pending(self._apply_interest_fees_button, False)
+        if not isinstance(error, (TransactionLimitError, ConcurrentUpdateError)):
+            raise error
+        messagebox.showwarning("Error", error.message)
+
+    def _close(self):
+        #queued writes are finished before the worker's session is closed
+        self._window.withdraw()
+        self._worker.close()
+        self._window.destroy()
     
     def _on_account_selected(self, account):
         self._selected_account = account
+        self._bank.pin_account(account)
         if self._add_transaction_frame is not None:
             self._add_transaction_frame.update_selected_account(account)
         self._transaction_list_frame.set_selected_account(account)
@@ -139,18 +165,15 @@ class BankGUI:
 
     
 if __name__ == "__main__":
-    engine = create_engine(f"sqlite:///bank.db")
-    Base.metadata.create_all(engine)
-    Session = sessionmaker(engine) 
+    configure_logging('bank.log')
+    Session = make_session_factory("bank.db")
 
-    logging.basicConfig(filename='bank.log', level=logging.DEBUG,
-                    format='%(asctime)s|%(levelname)s|%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
     try:
        app = BankGUI()
        app._window.mainloop()
     except Exception as e:
         error_message = str(e).replace('\n', '\\n')
-        logging.error(f"{type(e).__name__}: '{error_message}'")
+        logging.error("%s: '%s'", type(e).__name__, error_message)
         handle_exception(e)
 
 
@@ -0,0 +1,80 @@
+"""Runs the GUI's database writes on a background thread so the window never waits on SQLite.
+
+The worker owns its own session and copy of the bank. Requests are queued as functions of
+(bank, session) and run one at a time; their results, or the exceptions they raised, are
+handed back to the Tk main thread, which polls for them with after() and calls the
+request's callbacks there. Tk widgets must only be touched from those callbacks.
+"""
+import logging
+import queue
+import threading
+
+from bank import Bank
+
+#how often the main thread checks for finished requests, in milliseconds
+POLL_INTERVAL = 50
+
+
+class DatabaseWorker:
+    """Background thread that runs requests against the bank with bank_id in its own session."""
+    def __init__(self, root, Session, bank_id, poll_interval=POLL_INTERVAL):
+        self._root = root
+        self._Session = Session
+        self._bank_id = bank_id
+        self._poll_interval = poll_interval
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="database-worker", daemon=True)
+        self._thread.start()
+        self._after_id = self._root.after(self._poll_interval, self._poll)
+
+    def submit(self, operation, on_success=None, on_error=None):
+        """Queues operation(bank, session) to run on the worker thread.
+
+        The operation has to commit its own writes: the worker session is rolled back after every
+        request. on_success is then called on the main thread with its return value, or on_error
+        with the exception it raised. Without on_error the exception is raised from the Tk callback.
+        """
+        self._requests.put((operation, on_success, on_error))
+
+    def close(self):
+        """Lets the queued requests finish, then stops the thread and closes its session."""
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+        self._requests.put(None)
+        self._thread.join()
+
+    def _run(self):
+        session = self._Session()
+        bank = session.get(Bank, self._bank_id)
+        try:
+            session.rollback()
+            while (request := self._requests.get()) is not None:
+                operation, on_success, on_error = request
+                try:
+                    result, failed = operation(bank, session), False
+                except Exception as e:
+                    result, failed = e, True
+                #ends the request's transaction, so no read snapshot is held while idle and the next
+                #request reloads the bank and accounts instead of seeing stale rows
+                session.rollback()
+                self._results.put((on_error if failed else on_success, result, failed))
+        finally:
+            session.close()
+
+    def _poll(self):
+        try:
+            while True:
+                try:
+                    callback, value, failed = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if failed and callback is None:
+                    error_message = str(value).replace('\n', '\\n')
+                    logging.error("%s: '%s'", type(value).__name__, error_message)
+                    raise value
+                if callback is not None:
+                    callback(value)
+        finally:
+            self._after_id = self._root.after(self._poll_interval, self._poll)
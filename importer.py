@@ -0,0 +1,50 @@
+from datetime import datetime
+import csv
+import gzip
+import json
+
+from money import parse_dollars
+
+TYPES = ("normal", "interest", "fees")
+
+
+def read_transactions(path):
+    """Reads (account number, amount, date, type) records from a .csv or .jsonl file, or a gzipped one.
+
+    CSV files need an account,amount,date header row; JSON-lines files hold one
+    object per line with the same keys. The type column written by the exporter is
+    optional and defaults to normal. Raises ValueError on a malformed record.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="") as file:
+        if path.removesuffix(".gz").endswith(".jsonl"):
+            return list(_read_jsonl(file))
+        return list(_read_csv(file))
+
+
+def _read_csv(file):
+    for line_number, record in enumerate(csv.DictReader(file), start=2):
+        yield _parse_record(record, line_number)
+
+
+def _read_jsonl(file):
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"Line {line_number}: invalid JSON.")
+            yield _parse_record(record, line_number)
+
+
+def _parse_record(record, line_number):
+    try:
+        account_number = int(record["account"])
+        amount = parse_dollars(record["amount"])
+        date = datetime.strptime(str(record["date"]), "%Y-%m-%d").date()
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Line {line_number}: expected an account number, a dollar amount and a YYYY-MM-DD date.")
+    typeof = record.get("type") or "normal"
+    if typeof not in TYPES:
+        raise ValueError(f"Line {line_number}: the type must be one of {', '.join(TYPES)}.")
+    return account_number, amount, date, typeof
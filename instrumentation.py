@@ -0,0 +1,181 @@
+from collections import Counter
+from functools import wraps
+import json
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import Base
+
+
+#upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+
+class OperationStats:
+    """Latency histogram and SQL accounting for one kind of operation."""
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.statements = 0
+        self.rows_written = 0
+        self.rows_loaded = 0
+
+    def record(self, elapsed_ms):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "max_ms": self.max_ms,
+            "histogram_ms": {("inf" if bound == float("inf") else str(bound)): count
+                             for bound, count in zip(BUCKETS_MS, self.buckets)},
+            "sql_statements": self.statements,
+            "rows_written": self.rows_written,
+            "rows_loaded": self.rows_loaded,
+            "statements_per_call": self.statements / self.calls if self.calls else 0.0,
+        }
+
+
+class Metrics:
+    """Collects operation latencies, the SQL each operation triggered, and lazy-load counters.
+
+    SQL statements, written rows and hydrated ORM rows are charged to every operation that
+    is running on the same thread when they happen, so nested operations are counted
+    inclusively. Operations may run on several threads at once.
+    """
+    def __init__(self):
+        self._operations = {}
+        #each thread has its own stack of running operations
+        self._local = threading.local()
+        #guards the counters, which every thread updates
+        self._lock = threading.Lock()
+        self._lazy_loads = Counter()
+        self._refresh_loads = Counter()
+        self._statements = 0
+        self._engines = set()
+        self._listening = False
+
+    def attach(self, engine):
+        """Starts counting the SQL statements run on engine and the ORM loads of every session."""
+        if engine not in self._engines:
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+            self._engines.add(engine)
+        if not self._listening:
+            event.listen(Session, "do_orm_execute", self._on_orm_execute)
+            event.listen(Base, "load", self._on_load, propagate=True)
+            self._listening = True
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._lazy_loads.clear()
+            self._refresh_loads.clear()
+            self._statements = 0
+
+    @property
+    def _active(self):
+        active = getattr(self._local, "active", None)
+        if active is None:
+            active = self._local.active = []
+        return active
+
+    def _stats(self, name):
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats()
+            return stats
+
+    def measure(self, name, function, *args, **kwargs):
+        """Calls function and records its latency and SQL activity under name."""
+        stats = self._stats(name)
+        active = self._active
+        active.append(stats)
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            active.pop()
+            with self._lock:
+                stats.record(elapsed_ms)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        rows = cursor.rowcount if cursor.rowcount > 0 else 0
+        with self._lock:
+            self._statements += 1
+            for stats in self._active:
+                stats.statements += 1
+                stats.rows_written += rows
+
+    def _on_load(self, target, context):
+        with self._lock:
+            for stats in self._active:
+                stats.rows_loaded += 1
+
+    def _on_orm_execute(self, orm_execute_state):
+        if orm_execute_state.is_relationship_load and orm_execute_state.lazy_loaded_from is not None:
+            relationship = orm_execute_state.loader_strategy_path.path[-1]
+            with self._lock:
+                self._lazy_loads[f"{relationship.parent.class_.__name__}.{relationship.key}"] += 1
+        elif orm_execute_state.is_column_load and orm_execute_state.bind_mapper is not None:
+            with self._lock:
+                self._refresh_loads[orm_execute_state.bind_mapper.class_.__name__] += 1
+
+    def snapshot(self):
+        """Returns every counter as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "operations": {name: stats.as_dict() for name, stats in sorted(self._operations.items())},
+                "sql_statements": self._statements,
+                "lazy_loads": dict(self._lazy_loads),
+                "expired_attribute_loads": dict(self._refresh_loads),
+            }
+
+    def report(self):
+        """Returns a human readable summary of the collected metrics."""
+        with self._lock:
+            return self._report()
+
+    def _report(self):
+        lines = [f"{'operation':<28}{'calls':>8}{'mean ms':>10}{'max ms':>10}{'sql/call':>10}{'rows':>8}"]
+        for name, stats in sorted(self._operations.items()):
+            summary = stats.as_dict()
+            lines.append(f"{name:<28}{stats.calls:>8}{summary['mean_ms']:>10.3f}{stats.max_ms:>10.3f}"
+                         f"{summary['statements_per_call']:>10.1f}{stats.rows_written + stats.rows_loaded:>8}")
+        lines.append(f"SQL statements: {self._statements}")
+        for key, count in sorted(self._lazy_loads.items()):
+            lines.append(f"Lazy loads of {key}: {count}")
+        for key, count in sorted(self._refresh_loads.items()):
+            lines.append(f"Expired attribute loads of {key}: {count}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Writes the snapshot to path as JSON."""
+        with open(path, "w") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+metrics = Metrics()
+
+
+def instrumented(name):
+    """Decorator that records calls of a method under name in the shared metrics."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            return metrics.measure(name, function, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,13 @@
+from bisect import insort_right
+
+
+class Ledger(list):
+    """A transaction collection kept in date order as transactions are appended."""
+
+    def append(self, transaction):
+        """Appends in O(1) when the transaction is the newest, otherwise inserts it in order."""
+        if not self or not transaction < self[-1]:
+            list.append(self, transaction)
+        else:
+            insort_right(self, transaction)
+
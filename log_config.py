@@ -0,0 +1,79 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+import atexit
+import json
+import logging
+import queue
+
+LOG_FORMAT = '%(asctime)s|%(levelname)s|%(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues records without formatting them, so the message is only built on the writer thread.
+
+    Log arguments must therefore be immutable values such as numbers and strings.
+    """
+    def prepare(self, record):
+        if record.exc_info:
+            #tracebacks can't be rendered once the frames are gone, so format them here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _Listener(QueueListener):
+    """Queue listener that can be stopped more than once, by its caller and again when the interpreter exits."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stopped = False
+
+    def start(self):
+        self._stopped = False
+        super().start()
+
+    def stop(self):
+        if not self._stopped:
+            self._stopped = True
+            super().stop()
+
+
+def configure_logging(filename='bank.log', level=logging.DEBUG, max_bytes=10 * 1024 * 1024, when=None,
+                      backup_count=5, json_lines=False, logger=None):
+    """Sends log records through a queue to a background thread that writes them to filename.
+
+    Files rotate by size once they reach max_bytes, or by time when a TimedRotatingFileHandler
+    interval such as 'midnight' is given as when; pass max_bytes=0 and no when to never rotate.
+    With json_lines the file holds one JSON object per record. Returns the queue listener,
+    which is stopped and flushed when the interpreter exits.
+    """
+    if when:
+        file_handler = TimedRotatingFileHandler(filename, when=when, backupCount=backup_count)
+    else:
+        file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count)
+    if json_lines:
+        file_handler.setFormatter(JsonLinesFormatter(datefmt=DATE_FORMAT))
+    else:
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+
+    records = queue.SimpleQueue()
+    listener = _Listener(records, file_handler, respect_handler_level=True)
+    logger = logger or logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(_DeferredQueueHandler(records))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
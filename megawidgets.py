@@ -1,38 +1,78 @@
 from tkcalendar import Calendar
-from decimal import Decimal, InvalidOperation
 from datetime import datetime
-from errors import OverdrawError, TransactionSequenceError, TransactionLimitError
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError
+from money import format_cents, parse_dollars
 import tkinter as tk
 from tkinter import messagebox, ttk
 import logging
 
 
+def set_pending(button, pending):
+    """Disables button and shows that its request is waiting on the database worker, or restores it."""
+    if not button.winfo_exists():
+        return
+    if pending:
+        button._idle_text = button.cget("text")
+        button.config(text="Saving...", state=tk.DISABLED, cursor="watch")
+    else:
+        button.config(text=getattr(button, "_idle_text", button.cget("text")), state=tk.NORMAL, cursor="")
+
+
 class TransactionListFrame(tk.Frame):
-    """Class that manages the transaction list window for the selected account."""
+    """Class that manages the transaction list window for the selected account.
+
+    Transactions are shown in a Treeview that is fed one window of rows at a time as the
+    user scrolls, and new transactions are appended instead of rebuilding the list.
+    """
     def __init__(self, parent, session, bank, *args, **kwargs):
         super().__init__(parent, *args, **kwargs, bg='white')
         self._session = session
         self._bank = bank
         self._selected_account = None
-        self._title_label = None
+        self._window_size = 100
+        self._loaded_count = 0
+        self._total_count = 0
 
-    def _update_transactions(self, account):
-        for widget in self.winfo_children():
-            widget.destroy()
+        self._title_label = tk.Label(self, text="Select/Open an account to view transactions", bg='white', fg='black', font=('Helvetica', 14, 'bold'))
+        self._title_label.pack(side=tk.TOP, pady=(10, 5))
+
+        #sets up the scrollable transaction table
+        self._table_frame = tk.Frame(self, bg='white')
+        self._table_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=20)
+        self._tree = ttk.Treeview(self._table_frame, columns=("date", "amount"), show="headings", height=10)
+        self._tree.heading("date", text="Date")
+        self._tree.heading("amount", text="Amount")
+        self._tree.column("amount", anchor='e')
+        self._tree.tag_configure("debit", foreground='red')
+        self._tree.tag_configure("credit", foreground='green')
+        self._scrollbar = ttk.Scrollbar(self._table_frame, orient=tk.VERTICAL, command=self._tree.yview)
+        self._tree.configure(yscrollcommand=self._on_scroll)
+        self._tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        self._title_label = tk.Label(self, text="Transactions", bg='white', fg='black', font=('Helvetica', 14, 'bold'))
-        self._title_label.pack(side=tk.TOP, pady=(10, 5)) 
+    def _on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        #fetches the next window once the view gets close to the last loaded row
+        if float(last) > 0.9 and self._loaded_count < self._total_count:
+            self._load_next_window()
 
+    def _load_next_window(self):
+        transactions = self._selected_account.get_transactions(offset=self._loaded_count, limit=self._window_size)
+        for transaction in transactions:
+            tag = "debit" if transaction.get_amount() < 0 else "credit"
+            self._tree.insert("", tk.END, values=(transaction.get_date().strftime("%Y-%m-%d"), format_cents(transaction.get_amount())), tags=(tag,))
+        self._loaded_count += len(transactions)
+
+    def _update_transactions(self, account):
+        self._tree.delete(*self._tree.get_children())
+        self._loaded_count = 0
+        self._total_count = 0
         if account is not None:
-            transactions = account.get_transactions() 
-            for transaction in transactions:
-                if transaction.get_amount() < 0:
-                    tk.Label(self, text=str(transaction), bg='white', fg='red', font=('Helvetica', 11)).pack(anchor='w', padx=20, pady=(0, 2))
-                else:
-                    tk.Label(self, text=str(transaction), bg='white', fg='green', font=('Helvetica', 11)).pack(anchor='w', padx=20, pady=(0, 2))
+            self._title_label.config(text="Transactions")
+            self._total_count = account.count_transactions()
+            self._load_next_window()
         else:
-            self._title_label = tk.Label(self, text="Select/Open an account to view transactions", bg='white', fg='black', font=('Helvetica', 14, 'bold'))
-            self._title_label.pack(side=tk.TOP, pady=(10, 5))
+            self._title_label.config(text="Select/Open an account to view transactions")
 
     def set_selected_account(self, account):
         """Recieves new account as parameter and resets the display of transactions based on passed account"""
@@ -40,18 +80,27 @@ class TransactionListFrame(tk.Frame):
         self._update_transactions(account)
 
     def refresh(self):
-        """Refreshes the transactions when called on of the selected account"""
-        self._update_transactions(self._selected_account)
+        """Picks up transactions added to the selected account since the last refresh"""
+        if self._selected_account is None:
+            self._update_transactions(None)
+            return
+        fully_loaded = self._loaded_count >= self._total_count
+        self._total_count = self._selected_account.count_transactions()
+        if self._total_count < self._loaded_count:
+            self._update_transactions(self._selected_account)
+        elif fully_loaded and self._loaded_count < self._total_count:
+            #new transactions always sort after the loaded ones, so they can be appended
+            self._load_next_window()
 
 
 class AddTransactionFrame(tk.Frame):
     """Class that manages the transaction entry window"""
-    def __init__(self, parent, session, bank, selected_account, account_list_frame, transaction_list_frame, *args, **kwargs):
+    def __init__(self, parent, session, worker, selected_account, account_list_frame, transaction_list_frame, *args, **kwargs):
         super().__init__(parent, *args, **kwargs, bg='white')
         
         #variable initializations 
         self._session = session
-        self._bank = bank
+        self._worker = worker
         self._selected_account = selected_account
         self._account_list = account_list_frame
         self._transaction_list = transaction_list_frame
@@ -81,33 +130,43 @@ class AddTransactionFrame(tk.Frame):
         self._cancel_button.pack(side=tk.RIGHT, padx=5, pady=5)
 
     def _add_transaction_in_frame(self):
-        try:
-            amount = self._amount_entry.get()
-            date_str = self._date_picker.get_date() 
-            date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            if self._validate_amount():
-                self._bank.add_transaction(self._selected_account, amount, date, self._session)
-                self.destroy()
-                self._session.commit()
-                self._account_list.refresh()
-                self._transaction_list.refresh()
-            else:
-                messagebox.showerror("Error", "Invalid amount format")
-        except OverdrawError as e:
-            messagebox.showwarning("Error", e.message)
-        except TransactionLimitError as e:
-            messagebox.showwarning("Error", e.message)
-        except TransactionSequenceError as e:
-            messagebox.showwarning("Error", e.message)
+        amount = self._amount_entry.get()
+        date_str = self._date_picker.get_date() 
+        date = datetime.strptime(date_str, "%Y-%m-%d").date()
+        if not self._validate_amount():
+            messagebox.showerror("Error", "Invalid amount format")
+            return
+        account_number = self._selected_account.get_account_number()
+
+        def post(bank, session):
+            bank.add_transaction(bank.get_account(account_number), amount, date, session)
+            session.commit()
+
+        set_pending(self._enter_button, True)
+        self._worker.submit(post, self._on_added, self._on_failed)
+
+    def _on_added(self, result):
+        #ends the read so the lists pick up what the worker committed
+        self._session.commit()
+        self._account_list.refresh()
+        self._transaction_list.refresh()
+        if self.winfo_exists():
+            self.destroy()
+
+    def _on_failed(self, error):
+        set_pending(self._enter_button, False)
+        if not isinstance(error, (OverdrawError, TransactionLimitError, TransactionSequenceError, ConcurrentUpdateError)):
+            raise error
+        messagebox.showwarning("Error", error.message)
             
 
     def _validate_amount(self, event = None):
         amount = self._amount_entry.get()
         try:
-            Decimal(amount)
+            parse_dollars(amount)
             self._amount_entry.config(highlightbackground='green', highlightcolor='green', highlightthickness=2)
             return True
-        except InvalidOperation:
+        except ValueError:
             self._amount_entry.config(highlightbackground='red', highlightcolor='red', highlightthickness=2)
             return False
 
@@ -130,47 +189,128 @@ class AddTransactionFrame(tk.Frame):
 
 
 class AccountListFrame(tk.Frame):
-    """Frame that presents all the available accounts and their balances, as well as current account selection."""
+    """Frame that presents the available accounts and their balances, as well as current account selection.
+
+    Accounts are shown in a Treeview that is fed one page at a time, in account number order,
+    as the user scrolls towards either end of what is loaded. Refreshing appends new accounts
+    and updates the text of loaded accounts whose balance changed.
+    """
     def __init__(self, parent, session, bank, on_account_select, *args, **kwargs):
         super().__init__(parent, *args, **kwargs, bg='white')
         self._session = session
         self._bank = bank
-        self._selected_account = tk.StringVar()
         self._on_account_select = on_account_select
-        self._update_accounts()
+        self._page_size = 200
+        self._balances = {}
+        #lowest and highest loaded account numbers, and whether there may be accounts beyond them
+        self._first = None
+        self._last = None
+        self._more_before = False
+        self._more_after = True
+
+        #sets up the search box
+        self._search_frame = tk.Frame(self, bg='white')
+        self._search_frame.pack(side=tk.TOP, fill=tk.X)
+        tk.Label(self._search_frame, text="Find account #", bg='white', fg='black').pack(side=tk.LEFT, padx=(20, 5))
+        self._search_var = tk.StringVar()
+        self._search_entry = tk.Entry(self._search_frame, textvariable=self._search_var, bg='white', fg='black')
+        self._search_entry.bind('<Return>', self._search)
+        self._search_entry.pack(side=tk.LEFT, pady=5)
+
+        #sets up the scrollable account table
+        self._table_frame = tk.Frame(self, bg='white')
+        self._table_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=20)
+        self._tree = ttk.Treeview(self._table_frame, columns=("account",), show="", selectmode="browse", height=7)
+        self._scrollbar = ttk.Scrollbar(self._table_frame, orient=tk.VERTICAL, command=self._tree.yview)
+        self._tree.configure(yscrollcommand=self._on_scroll)
+        self._tree.bind('<<TreeviewSelect>>', self._account_selected)
+        self._tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self._load_after()
+
+    def _on_scroll(self, first, last):
+        self._scrollbar.set(first, last)
+        #fetches the next page once the view gets close to either end of the loaded rows
+        if float(last) > 0.9 and self._more_after:
+            self._load_after()
+        elif float(first) < 0.1 and self._more_before:
+            self._load_before()
 
-        self._accounts = self._bank.get_accounts()
-        self._account_selected()
+    def _load_after(self):
+        accounts = self._bank.get_accounts(limit=self._page_size, after=self._last)
+        for account in accounts:
+            self._insert_row(tk.END, account)
+        if accounts:
+            self._first = accounts[0].get_account_number() if self._first is None else self._first
+            self._last = accounts[-1].get_account_number()
+        self._more_after = len(accounts) == self._page_size
+
+    def _load_before(self):
+        accounts = self._bank.get_accounts(limit=self._page_size, before=self._first)
+        for index, account in enumerate(accounts):
+            self._insert_row(index, account)
+        if accounts:
+            self._first = accounts[0].get_account_number()
+            #keeps the rows that were in view where they were
+            self._tree.yview_scroll(len(accounts), "units")
+        self._more_before = len(accounts) == self._page_size
+
+    def _insert_row(self, index, account):
+        account_number = account.get_account_number()
+        self._tree.insert("", index, iid=str(account_number), values=(str(account),))
+        self._balances[account_number] = account._balance
 
     def _update_accounts(self):
-        for widget in self.winfo_children():
-            widget.destroy()
-        self._accounts = self._bank.get_accounts()
-        for account in self._accounts:
-            rb = tk.Radiobutton(self, text=str(account),
-                                variable=self._selected_account, value=account.get_account_number(),
-                                bg='white', fg='black', selectcolor='blue', highlightthickness=0, 
-                                command=self._account_selected)
-            rb.pack(anchor='w', padx=20)
-        if self._accounts:
-            self._account_selected()
+        if self._first is not None:
+            balances = self._bank.get_account_balances(self._first, self._last)
+            for account_number, balance in balances.items():
+                if account_number in self._balances and balance != self._balances[account_number]:
+                    self._tree.item(str(account_number), values=(str(self._bank.get_account(account_number)),))
+                    self._balances[account_number] = balance
+        #account numbers only grow, so new accounts are appended after the loaded rows
+        if not self._more_after:
+            self._load_after()
 
     def refresh(self):
-        """Refreshes the accounts by calling update_accounts."""
+        """Adds rows for new accounts and updates the balances that changed."""
         self._update_accounts()
-    
-    def _account_selected(self):
-        account_number = self._selected_account.get()
-        if account_number:
-            self._on_account_select(self._bank.get_account(account_number))
+
+    def _account_selected(self, event=None):
+        selection = self._tree.selection()
+        if selection:
+            self._on_account_select(self._bank.get_account(selection[0]))
+
+    def _search(self, event=None):
+        try:
+            account_number = int(self._search_var.get())
+        except ValueError:
+            messagebox.showwarning("Error", "Please enter an account number.")
+            return
+        if not self._tree.exists(str(account_number)):
+            if self._bank.get_account(account_number) is None:
+                messagebox.showwarning("Error", f"There is no account #{account_number}.")
+                return
+            self._jump_to(account_number)
+        self._tree.selection_set(str(account_number))
+        self._tree.see(str(account_number))
+
+    def _jump_to(self, account_number):
+        """Replaces the loaded rows with the page that starts at account_number."""
+        self._tree.delete(*self._tree.get_children())
+        self._balances = {}
+        self._first = None
+        self._last = account_number - 1
+        self._load_after()
+        self._more_before = True
 
 
 class OpenAccountFrame(tk.Frame):
     """A megawidget for opening a new bank account."""
-    def __init__(self, parent, session, bank, account_list, *args, **kwargs):
+    def __init__(self, parent, session, worker, account_list, *args, **kwargs):
         super().__init__(parent, *args, **kwargs, bg='#53a9ee')
         self._session = session
-        self._bank = bank
+        self._worker = worker
         self._account_list = account_list
         style = ttk.Style(parent)
         style.configure('TCombobox', highlightbackground='#53a9ee', background='#53a9ee', foreground='white')
@@ -190,13 +330,31 @@ class OpenAccountFrame(tk.Frame):
         self._cancel_button.pack(side=tk.LEFT, padx=5, pady=5)
 
     def _create_account(self):
-        if (self._account_type_var.get() == "checking" or self._account_type_var.get() == "savings"):
-            account_type = self._account_type_var.get()
-            self._bank.open_account(account_type, self._session)
+        account_type = self._account_type_var.get()
+        if account_type not in ("checking", "savings"):
+            self.destroy()
+            return
+
+        def open_account(bank, session):
+            bank.open_account(account_type, session)
+            session.commit()
             logging.debug("Saved to bank.db")
+
+        set_pending(self._enter_button, True)
+        self._worker.submit(open_account, self._on_opened, self._on_failed)
+
+    def _on_opened(self, result):
+        #ends the read so the list picks up the account the worker committed
         self._session.commit()
         self._account_list.refresh()
-        self.destroy()
+        if self.winfo_exists():
+            self.destroy()
+
+    def _on_failed(self, error):
+        set_pending(self._enter_button, False)
+        if not isinstance(error, ConcurrentUpdateError):
+            raise error
+        messagebox.showwarning("Error", error.message)
 
     def _cancel(self):
         self.destroy()
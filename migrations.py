@@ -0,0 +1,95 @@
+"""Schema and data migrations for existing bank.db files, tracked with SQLite's user_version pragma."""
+import logging
+
+from money import to_cents
+
+
+def _integer_cents(connection, chunk_size=10000):
+    """Converts Numeric dollar amounts to integer cents and recomputes balances from the converted amounts.
+
+    Amounts go through money.to_cents, so they are rounded half to even like newly posted ones;
+    SQLite's ROUND would round half away from zero.
+    """
+    last_id = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            "SELECT _id, _amount FROM transactions WHERE _id > ? ORDER BY _id LIMIT ?", (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        #str gives the shortest decimal for a stored float, e.g. 0.125 rather than its binary expansion
+        connection.exec_driver_sql("UPDATE transactions SET _amount = ? WHERE _id = ?",
+                                   [(None if amount is None else to_cents(str(amount)), row_id) for row_id, amount in rows])
+        last_id = rows[-1][0]
+    connection.exec_driver_sql(
+        "UPDATE account SET _balance = (SELECT COALESCE(SUM(_amount), 0) FROM transactions "
+        "WHERE transactions._account_id = account._account_number)")
+
+
+def _version_columns(connection):
+    """Adds the row version counters that detect concurrent updates to banks and accounts."""
+    for table in ("bank", "account"):
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN _version INTEGER NOT NULL DEFAULT 1")
+
+
+def _transaction_indexes(connection):
+    """Indexes transactions by account and date, and by account, type and date."""
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_account_date ON transactions (_account_id, _date)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_account_type_date ON transactions (_account_id, _typeof, _date)")
+
+
+def _account_markers(connection):
+    """Adds each account's latest transaction date and last interest date, backfilled from its history."""
+    connection.exec_driver_sql("ALTER TABLE account ADD COLUMN _latest_transaction_date DATE")
+    connection.exec_driver_sql("ALTER TABLE account ADD COLUMN _last_interest_date DATE")
+    connection.exec_driver_sql(
+        "UPDATE account SET _latest_transaction_date = (SELECT MAX(_date) FROM transactions "
+        "WHERE transactions._account_id = account._account_number), "
+        "_last_interest_date = (SELECT MAX(_date) FROM transactions "
+        "WHERE transactions._account_id = account._account_number AND transactions._typeof = 'interest')")
+
+
+def _balance_snapshots(connection):
+    """Creates the monthly balance snapshots table if create_all hasn't, and fills it from the transaction history."""
+    #imported here because the model modules import database, which imports this one; account
+    #registers the account table the snapshots' foreign key refers to
+    import account
+    from balance_snapshot import BalanceSnapshot, rebuild_balance_snapshots
+    BalanceSnapshot.__table__.create(connection, checkfirst=True)
+    rebuild_balance_snapshots(connection)
+
+
+#(version, description, step) in the order they must run
+MIGRATIONS = [
+    (1, "store money as integer cents", _integer_cents),
+    (2, "add version columns to bank and account", _version_columns),
+    (3, "index transactions by account, type and date", _transaction_indexes),
+    (4, "store latest transaction and interest dates on accounts", _account_markers),
+    (5, "add monthly balance snapshots", _balance_snapshots),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(connection):
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def stamp(engine, version=LATEST_VERSION):
+    """Marks a freshly created database as already having every migration."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def migrate(engine):
+    """Runs the migrations the database hasn't had yet, each in its own transaction."""
+    with engine.connect() as connection:
+        current = get_version(connection)
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            step(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        logging.info("Migrated bank.db to version %s: %s", version, description)
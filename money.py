@@ -0,0 +1,45 @@
+"""Money is held as integer cents. Dollar amounts are converted once at the edges, interest is
+computed with integer arithmetic and rounded half to even, and fees are exact cent amounts."""
+from decimal import Decimal, ROUND_HALF_EVEN
+
+#largest amount in cents that fits SQLite's 64-bit integers
+MAX_CENTS = 2 ** 63 - 1
+
+
+def to_cents(amount):
+    """Converts a dollar amount (Decimal, str or int) to integer cents, rounding half to even."""
+    return int((Decimal(amount) * 100).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def parse_dollars(amount):
+    """Reads a dollar amount from a str, int or Decimal and returns it as a Decimal.
+
+    Raises ValueError unless it is a finite number whose cents fit SQLite's 64-bit integers.
+    """
+    try:
+        dollars = Decimal(str(amount))
+        cents = to_cents(dollars)
+    except (ArithmeticError, ValueError):
+        cents = None
+    if cents is None or abs(cents) > MAX_CENTS:
+        raise ValueError(f"{amount!r} is not a dollar amount.")
+    return dollars
+
+
+def apply_rate(cents, numerator, denominator):
+    """Returns cents * numerator / denominator rounded half to even, using integer arithmetic only."""
+    quotient, remainder = divmod(cents * numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+def format_cents(cents):
+    """Formats cents as a dollar string such as $1,234.50 or $-5.44."""
+    return f"${Decimal(cents).scaleb(-2):,.2f}"
+
+
+def cents_to_dollars(cents):
+    """Formats cents as a plain dollar amount such as 1234.50 or -5.44, which to_cents reads back exactly."""
+    dollars, remainder = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{dollars}.{remainder:02d}"
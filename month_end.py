@@ -0,0 +1,142 @@
+"""Parallel month-end close: worker processes compute interest and fees for ranges of account numbers,
+and the calling process writes every result in bulk.
+
+The postings come from the same Checking/Savings.interest_and_fees rules and skip rules as
+Bank.close_month, so both paths produce identical transactions and balances.
+
+The workers' reads are not protected against concurrent postings or a second close of the
+same month: a balance can change after a worker has read it. Each chunk is therefore checked
+again under SQLite's write lock before it is written. Accounts that have been closed for the
+month, or that have postings after it, are skipped, and accounts whose balance changed have
+their interest recomputed from the current balance.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from sqlalchemy import select, insert, update, func, bindparam
+from sqlalchemy.orm import sessionmaker
+
+from account import Account
+from transaction import Transaction
+from balance_snapshot import apply_balance_changes
+from concurrency import retry_on_conflict, take_write_lock
+#imported so spawned workers register the account subclasses with the mapper
+import checking_account
+import savings_account
+
+
+def _account_classes():
+    return {mapper.polymorphic_identity: mapper.class_ for mapper in Account.__mapper__.self_and_descendants}
+
+
+def _range_postings(database, bank_id, low, high, first_day, last_day):
+    """Worker: returns (skipped, [(account number, type, balance, [(amount, type), ...]), ...]) for accounts low..high."""
+    from database import make_engine
+    engine = make_engine(database, pool_size=1, max_overflow=0)
+    Session = sessionmaker(engine)
+    account_classes = _account_classes()
+    statement = (select(Account._account_number, Account._type, Account._balance,
+                        Account._latest_transaction_date, Account._last_interest_date)
+                 .where(Account._bank_id == bank_id, Account._account_number.between(low, high))
+                 .order_by(Account._account_number))
+    skipped = 0
+    results = []
+    try:
+        with Session() as session:
+            for account_number, account_type, balance, latest_date, last_interest_date in session.execute(statement):
+                if latest_date is None or latest_date > last_day or (last_interest_date is not None and
+                                                                     last_interest_date >= first_day):
+                    skipped += 1
+                    continue
+                results.append((account_number, account_type, balance, account_classes[account_type].interest_and_fees(balance)))
+    finally:
+        engine.dispose()
+    return skipped, results
+
+
+def _partition(last_account_number, parts):
+    """Splits 1..last_account_number into at most parts contiguous (low, high) ranges."""
+    size = max(1, -(-last_account_number // parts))
+    return [(low, min(low + size - 1, last_account_number)) for low in range(1, last_account_number + 1, size)]
+
+
+def close_month_parallel(bank, session, first_day, last_day, workers, chunk_size=500):
+    """Computes the close across a process pool and writes the results through session. Returns (processed, skipped)."""
+    database = session.get_bind().url.database
+    if not database or database == ":memory:":
+        raise ValueError("A parallel close needs a database file that worker processes can open.")
+    #workers read committed data, so nothing may be left pending in this session
+    session.commit()
+    last_account_number = session.scalar(select(func.max(Account._account_number)).where(Account._bank_id == bank._id)) or 0
+    ranges = _partition(last_account_number, workers * 4)
+    processed = skipped = 0
+    touched = set()
+    pending = []
+    context = multiprocessing.get_context("spawn")
+
+    def write(pending):
+        #a conflict rolls the chunk back, and it is checked again from scratch on the next attempt
+        written, chunk_skipped = retry_on_conflict(lambda: _write(session, pending, first_day, last_day), session)
+        touched.update(written)
+        return len(written), chunk_skipped
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(_range_postings, database, bank._id, low, high, first_day, last_day)
+                   for low, high in ranges]
+        for future in futures:
+            range_skipped, results = future.result()
+            skipped += range_skipped
+            for result in results:
+                pending.append(result)
+                if len(pending) >= chunk_size:
+                    chunk_processed, chunk_skipped = write(pending)
+                    processed += chunk_processed
+                    skipped += chunk_skipped
+                    pending = []
+    if pending:
+        chunk_processed, chunk_skipped = write(pending)
+        processed += chunk_processed
+        skipped += chunk_skipped
+    #accounts already loaded in this session have to pick up the rows written behind the ORM's back
+    for instance in list(session.identity_map.values()):
+        if isinstance(instance, Account) and instance.get_account_number() in touched:
+            instance.reload_state(session)
+    return processed, skipped
+
+
+def _write(session, pending, first_day, last_day):
+    """Checks the computed postings against the accounts as they are now and writes them in one commit.
+
+    Returns (account numbers written, number skipped).
+    """
+    accounts = Account.__table__
+    account_classes = _account_classes()
+    #holding the write lock keeps other processes from posting between the check and the commit
+    take_write_lock(session)
+    current = {row[0]: row[1:] for row in session.execute(
+        select(accounts.c._account_number, accounts.c._balance, accounts.c._latest_transaction_date,
+               accounts.c._last_interest_date)
+        .where(accounts.c._account_number.in_([account_number for account_number, *_ in pending])))}
+    written = []
+    transaction_rows = []
+    balance_rows = []
+    for account_number, account_type, balance, postings in pending:
+        current_balance, latest_date, last_interest_date = current[account_number]
+        if latest_date is None or latest_date > last_day or (last_interest_date is not None and
+                                                             last_interest_date >= first_day):
+            continue
+        if current_balance != balance:
+            postings = account_classes[account_type].interest_and_fees(current_balance)
+        transaction_rows.extend({"_amount": amount, "_date": last_day, "_typeof": typeof,
+                                 "_account_id": account_number} for amount, typeof in postings)
+        balance_rows.append({"number": account_number, "delta": sum(amount for amount, _ in postings)})
+        written.append(account_number)
+    if balance_rows:
+        session.execute(insert(Transaction), transaction_rows)
+        session.execute(update(accounts).where(accounts.c._account_number == bindparam("number"))
+                        .values(_balance=accounts.c._balance + bindparam("delta"), _version=accounts.c._version + 1,
+                                _latest_transaction_date=last_day, _last_interest_date=last_day),
+                        balance_rows)
+        apply_balance_changes(session.connection(), [dict(row, month=first_day) for row in balance_rows])
+    session.commit()
+    return written, len(pending) - len(written)
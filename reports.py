@@ -0,0 +1,125 @@
+"""Monthly statements and bank-wide reports computed over a LedgerSnapshot.
+
+Run ``python reports.py 2024-03`` for a bank-wide report, or ``python reports.py --account 12``
+for every monthly statement of one account.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+import argparse
+import sys
+
+from account import _month_bounds
+from analytics import LedgerSnapshot
+from checking_account import LOW_BALANCE_THRESHOLD
+from database import make_session_factory
+from money import format_cents
+
+MonthlyStatement = namedtuple("MonthlyStatement", ["account_number", "year", "month", "opening_balance", "credits",
+                                                   "debits", "interest", "fees", "closing_balance"])
+
+
+def load_account_types(session):
+    """Returns a dict of account number to account type, read with one raw query."""
+    return dict(session.connection().exec_driver_sql("SELECT _account_number, _type FROM account").all())
+
+
+def monthly_statements(snapshot, year, month):
+    """Returns a statement for every account with a balance or activity in the month, in account order."""
+    first, last = _month_bounds(year, month)
+    opening = snapshot.balances_as_of(first - timedelta(days=1))
+    closing = snapshot.balances_as_of(last)
+    activity = snapshot.account_totals(first, last)
+    statements = []
+    for account_number, closing_balance in closing.items():
+        totals = activity.get(account_number)
+        if totals is None and closing_balance == 0 and opening[account_number] == 0:
+            continue
+        credits, debits, interest, fees = totals or (0, 0, 0, 0)
+        statements.append(MonthlyStatement(account_number, year, month, opening[account_number],
+                                           credits, debits, interest, fees, closing_balance))
+    return statements
+
+
+def account_statements(snapshot, account_number):
+    """Returns one statement per month for a single account, from its first month with activity to its last."""
+    flow = snapshot.monthly_net_flow(account_number)
+    if not flow:
+        return []
+    (year, month), (last_year, last_month) = min(flow), max(flow)
+    statements = []
+    while (year, month) <= (last_year, last_month):
+        first, last = _month_bounds(year, month)
+        credits, debits, interest, fees = snapshot.account_totals(first, last, account_number).get(account_number, (0, 0, 0, 0))
+        statements.append(MonthlyStatement(account_number, year, month,
+                                           snapshot.balance_as_of(account_number, first - timedelta(days=1)),
+                                           credits, debits, interest, fees,
+                                           snapshot.balance_as_of(account_number, last)))
+        year, month = year + month // 12, month % 12 + 1
+    return statements
+
+
+def deposits_by_type(snapshot, account_types, day):
+    """Returns a dict of account type to the total balance held in that type of account at the end of day."""
+    totals = {}
+    for account_number, balance in snapshot.balances_as_of(day).items():
+        account_type = account_types.get(account_number, "account")
+        totals[account_type] = totals.get(account_type, 0) + balance
+    return totals
+
+
+def low_balance_checking(snapshot, account_types, day):
+    """Returns (account number, balance) for checking accounts under the fee threshold at the end of day."""
+    balances = snapshot.balances_as_of(day)
+    return [(account_number, balance) for account_number, balance in balances.items()
+            if account_types.get(account_number) == "checking" and balance < LOW_BALANCE_THRESHOLD]
+
+
+def month_over_month_growth(snapshot):
+    """Returns (year, month, closing total, growth) per month, where growth is the change from the previous month as a fraction."""
+    growth = []
+    total = 0
+    for (year, month), net in sorted(snapshot.monthly_net_flow().items()):
+        previous = total
+        total += net
+        growth.append((year, month, total, (total - previous) / previous if previous else None))
+    return growth
+
+
+def _print_statements(statements):
+    print("account   month     opening     credits      debits    interest        fees     closing")
+    for s in statements:
+        print(f"{s.account_number:09d} {s.year}-{s.month:02d} " + " ".join(
+            f"{format_cents(value):>11}" for value in (s.opening_balance, s.credits, s.debits, s.interest, s.fees, s.closing_balance)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("month", nargs="?", help="YYYY-MM")
+    parser.add_argument("--account", type=int, help="print every monthly statement for this account")
+    parser.add_argument("--database", default="bank.db")
+    args = parser.parse_args(argv)
+    if args.month is None and args.account is None:
+        parser.error("give a month or an account")
+    Session = make_session_factory(args.database)
+    with Session() as session:
+        snapshot = LedgerSnapshot.load(session)
+        account_types = load_account_types(session)
+    if args.account is not None:
+        _print_statements(account_statements(snapshot, args.account))
+        return
+    month = datetime.strptime(args.month, "%Y-%m")
+    _, last = _month_bounds(month.year, month.month)
+    _print_statements(monthly_statements(snapshot, month.year, month.month))
+    print()
+    for account_type, total in sorted(deposits_by_type(snapshot, account_types, last).items()):
+        print(f"Total {account_type} deposits: {format_cents(total)}")
+    low = low_balance_checking(snapshot, account_types, last)
+    print(f"Checking accounts under {format_cents(LOW_BALANCE_THRESHOLD)}: {len(low)}")
+    for year, month_number, total, change in month_over_month_growth(snapshot):
+        if (year, month_number) <= (month.year, month.month):
+            change_text = "" if change is None else f" ({change:+.2%})"
+            print(f"{year}-{month_number:02d} total {format_cents(total)}{change_text}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 from account import Account
-from decimal import Decimal
+from money import apply_rate, format_cents
 from errors import TransactionLimitError
 
+#monthly interest of 0.41%
+INTEREST_RATE = (41, 10000)
+
 class Savings(Account):
 
     __mapper_args__ = {
@@ -16,13 +19,8 @@ class Savings(Account):
         """Determines if this account can add transactions"""
         if not super().can_add_transaction(amount, date):
             return False
-        year_month = date.strftime('%Y-%m')
-        same_day_transactions = sum(1 for transaction in self._transactions 
-                                if transaction.get_date() == date 
-                                and transaction.get_type() == "normal")
-        same_month_transactions = sum(1 for transaction in self._transactions 
-                                  if transaction.get_date().strftime('%Y-%m') == year_month 
-                                  and transaction.get_type() == "normal")
+        same_day_transactions = self._daily_count(date)
+        same_month_transactions = self._monthly_count(date.year, date.month)
         if same_day_transactions >= 2:
             raise TransactionLimitError(daily=True)
         elif same_month_transactions >= 5:
@@ -33,10 +31,16 @@ class Savings(Account):
     def apply_interest_and_fees(self, session):
         """Applies interest and fees to the account."""
         if self._has_interest_been_applied():
-            raise TransactionLimitError(latest_date = max(self._transactions).get_date())
+            raise TransactionLimitError(latest_date = self._get_latest_date())
         last_day = self._get_last_day_of_month() 
-        self.add_transaction(self._balance * Decimal('0.0041'), last_day, "interest", session)
+        self._post_interest_and_fees(last_day, session)
+        session.commit()
+
+    @staticmethod
+    def interest_and_fees(balance):
+        """Returns the (amount, type) postings in cents that month end produces for a balance in cents."""
+        return [(apply_rate(balance, *INTEREST_RATE), "interest")]
 
     def __str__(self):
         """String representation of the savings account object"""
-        return f"Savings#{self._account_number:09d},\tbalance: ${self._balance:,.2f}"
\ No newline at end of file
+        return f"Savings#{self._account_number:09d},\tbalance: {format_cents(self._balance)}"
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""Long-running bank service that keeps the Bank loaded between requests.
+
+Requests and responses are JSON objects, one per line, over a Unix socket or a localhost TCP
+port. A request names an op and its arguments, plus an optional id that is echoed back:
+
+    {"id": 1, "op": "open_account", "type": "savings"}
+    {"id": 2, "op": "post_transaction", "account": 1, "amount": "-50.00", "date": "2024-03-02"}
+    {"id": 3, "op": "list_transactions", "account": 1, "start": "2024-03-01", "limit": 100}
+    {"id": 4, "op": "apply_interest", "account": 1}
+    {"id": 5, "op": "get_account", "account": 1}
+
+and is answered with {"id": ..., "ok": true, "result": ...} or {"id": ..., "ok": false,
+"error": message, "type": error class}. Writes go through a single writer task, one at a time
+on one session; queued postings are committed together. Reads run concurrently on a pool of
+threads, each with its own session.
+
+Run ``python service.py --socket bank.sock`` or ``python service.py --port 8765``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+
+from sqlalchemy import select
+
+from account import Account
+from bank import Bank
+from database import make_session_factory
+from errors import OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError
+from log_config import configure_logging
+from money import parse_dollars
+
+
+class PostingRejected(Exception):
+    """A queued posting that failed validation, carrying the same message the CLI would print."""
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+DOMAIN_ERRORS = (OverdrawError, TransactionSequenceError, TransactionLimitError, ConcurrentUpdateError, PostingRejected)
+
+#queued postings committed together by the writer
+MAX_GROUP_COMMIT = 500
+#largest page of transactions one list_transactions request can ask for
+MAX_PAGE = 10000
+
+
+class BankService:
+    """Serves requests for the first bank in the database at path."""
+    def __init__(self, path="bank.db", readers=4):
+        self._Session = make_session_factory(path)
+        self._reader_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="reader")
+        self._reader_sessions = threading.local()
+        #every write runs on this one thread, with the session and bank below
+        self._writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self._writes = None
+        self._session = None
+        self._bank = None
+        self._bank_id = None
+        self._reads = {
+            "get_account": self._get_account,
+            "list_transactions": self._list_transactions,
+            "ping": lambda session, request: "pong",
+        }
+        self._write_ops = {
+            "open_account": self._open_account,
+            "apply_interest": self._apply_interest,
+        }
+
+    def _load_bank(self):
+        self._session = self._Session()
+        self._bank = self._session.query(Bank).first()
+        if self._bank is None:
+            self._bank = Bank()
+            self._session.add(self._bank)
+            self._session.commit()
+        return self._bank._id
+
+    async def serve(self, socket_path=None, port=None, host="127.0.0.1"):
+        """Serves until cancelled, on socket_path if given, otherwise on host:port."""
+        loop = asyncio.get_running_loop()
+        self._bank_id = await loop.run_in_executor(self._writer_pool, self._load_bank)
+        self._writes = asyncio.Queue()
+        writer = asyncio.create_task(self._writer())
+        if socket_path:
+            server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+        else:
+            server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+        logging.info("Bank service listening on %s", socket_path or f"{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer.cancel()
+            if socket_path and os.path.exists(socket_path):
+                os.unlink(socket_path)
+            await loop.run_in_executor(self._writer_pool, self._session.close)
+            self._writer_pool.shutdown()
+            self._reader_pool.shutdown()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                response = await self.handle(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, line):
+        """Answers one JSON request line with a response dict."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object.")
+            request_id = request.get("id")
+            op = request["op"]
+            if not isinstance(op, str):
+                raise ValueError("The op must be a string.")
+            if op in self._reads:
+                result = await asyncio.get_running_loop().run_in_executor(self._reader_pool, self._read, op, request)
+            elif op in self._write_ops or op == "post_transaction":
+                future = asyncio.get_running_loop().create_future()
+                await self._writes.put((op, request, future))
+                result = await future
+            else:
+                raise ValueError(f"Unknown op {op!r}.")
+        except DOMAIN_ERRORS as e:
+            return {"id": request_id, "ok": False, "error": e.message, "type": type(e).__name__}
+        except (ValueError, KeyError) as e:
+            message = f"Missing {e}." if isinstance(e, KeyError) else str(e)
+            return {"id": request_id, "ok": False, "error": message, "type": "BadRequest"}
+        except Exception as e:
+            logging.exception("Request failed: %s", line)
+            return {"id": request_id, "ok": False, "error": "Internal error.", "type": type(e).__name__}
+        return {"id": request_id, "ok": True, "result": result}
+
+    def _read(self, op, request):
+        session = getattr(self._reader_sessions, "session", None)
+        if session is None:
+            session = self._reader_sessions.session = self._Session()
+        try:
+            return self._reads[op](session, request)
+        finally:
+            #ends the read so the next request sees the latest committed writes
+            session.close()
+
+    async def _writer(self):
+        """Runs queued writes one at a time on the writer thread, committing consecutive postings together."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < MAX_GROUP_COMMIT and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            postings = []
+            for op, request, future in batch:
+                if op == "post_transaction":
+                    postings.append((request, future))
+                    continue
+                if postings:
+                    await self._run_write(loop, self._post_transactions, postings)
+                    postings = []
+                await self._run_write(loop, self._write_ops[op], [(request, future)])
+            if postings:
+                await self._run_write(loop, self._post_transactions, postings)
+
+    async def _run_write(self, loop, operation, requests):
+        try:
+            results = await loop.run_in_executor(self._writer_pool, operation, [request for request, _ in requests])
+        except Exception as e:
+            await loop.run_in_executor(self._writer_pool, self._session.rollback)
+            results = [e] * len(requests)
+        for (_, future), result in zip(requests, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    #the methods below run on the writer thread and return one result, or exception, per request
+
+    def _post_transactions(self, requests):
+        batch = []
+        results = [None] * len(requests)
+        for i, request in enumerate(requests):
+            try:
+                batch.append((i, _parse_posting(request)))
+            except (KeyError, ValueError, TypeError, ArithmeticError) as e:
+                #only this request is rejected; the rest of the group is still committed
+                results[i] = ValueError(f"Missing {e}." if isinstance(e, KeyError) else f"Invalid posting: {e}")
+        posted = self._bank.add_transactions([row for _, row in batch], self._session, chunk_size=MAX_GROUP_COMMIT)
+        for (i, _), result in zip(batch, posted):
+            results[i] = {"account": result.account_number} if result.accepted else PostingRejected(result.reason)
+        return results
+
+    def _open_account(self, requests):
+        (request,) = requests
+        if request.get("type") not in ("checking", "savings"):
+            raise ValueError("Account type must be checking or savings.")
+        account = self._bank.open_account(request["type"], self._session)
+        self._session.commit()
+        return [{"account": account.get_account_number(), "type": request["type"]}]
+
+    def _apply_interest(self, requests):
+        (request,) = requests
+        account = self._bank.get_account(_account_number(request))
+        if account is None:
+            raise ValueError("No such account.")
+        if account.count_transactions() == 0:
+            raise ValueError("Interest needs at least one transaction.")
+        self._bank.apply_interest_and_fees(account, self._session)
+        return [{"account": account.get_account_number(), "balance": account._balance}]
+
+    #reads, on any reader thread
+
+    def _get_account(self, session, request):
+        row = session.execute(select(Account._account_number, Account._type, Account._balance)
+                              .where(Account._account_number == _account_number(request),
+                                     Account._bank_id == self._bank_id)).first()
+        if row is None:
+            raise ValueError("No such account.")
+        return {"account": row[0], "type": row[1], "balance": row[2]}
+
+    def _list_transactions(self, session, request):
+        account = session.get(Account, _account_number(request))
+        if account is None or account._bank_id != self._bank_id:
+            raise ValueError("No such account.")
+        try:
+            start = request.get("start")
+            end = request.get("end")
+            start = date.fromisoformat(start) if start else None
+            end = date.fromisoformat(end) if end else None
+            offset = int(request.get("offset", 0))
+            limit = request.get("limit")
+            limit = None if limit is None else int(limit)
+        except TypeError as e:
+            raise ValueError(f"Invalid query: {e}") from None
+        if offset < 0 or (limit is not None and not 0 <= limit <= MAX_PAGE):
+            raise ValueError(f"offset must not be negative and limit must be between 0 and {MAX_PAGE}.")
+        transactions = account.get_transactions(start, end, offset, limit)
+        return [{"date": t.get_date().isoformat(), "amount": t.get_amount(), "type": t.get_type()} for t in transactions]
+
+
+def _parse_posting(request):
+    """Returns (account number, amount, date) for a post_transaction request, checking every field's type."""
+    amount = parse_dollars(request["amount"])
+    if not isinstance(request["date"], str):
+        raise TypeError("the date must be a YYYY-MM-DD string")
+    return _account_number(request), amount, date.fromisoformat(request["date"])
+
+
+def _account_number(request):
+    try:
+        return int(request["account"])
+    except TypeError:
+        raise ValueError("The account must be a number.") from None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--socket", help="path of the Unix socket to listen on")
+    group.add_argument("--port", type=int, help="localhost TCP port to listen on")
+    parser.add_argument("--database", default="bank.db")
+    parser.add_argument("--readers", type=int, default=4, help="threads serving reads")
+    args = parser.parse_args(argv)
+    configure_logging('bank.log')
+    service = BankService(args.database, args.readers)
+
+    async def run():
+        task = asyncio.create_task(service.serve(args.socket, args.port))
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signum, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+#registers every model before a session factory creates the tables
+from bank import Bank
+from database import make_session_factory
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "bank.db")
+
+
+@pytest.fixture
+def Session(db_path):
+    return make_session_factory(db_path)
+
+
+@pytest.fixture
+def session(Session):
+    session = Session()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def bank(session):
+    bank = Bank()
+    session.add(bank)
+    session.commit()
+    return bank
@@ -0,0 +1,73 @@
+from datetime import date
+
+from sqlalchemy import inspect
+
+from account_cache import AccountCache
+
+
+def open_accounts(bank, session, count):
+    accounts = [bank.open_account("checking", session) for _ in range(count)]
+    session.commit()
+    return accounts
+
+
+def test_evicts_least_recently_used_account(bank, session):
+    first, second, third = open_accounts(bank, session, 3)
+    cache = AccountCache(max_accounts=2)
+    cache.put(1, first)
+    cache.put(2, second)
+    assert cache.get(1) is first
+
+    cache.put(3, third)
+
+    #account 2 was used least recently, so it is dropped and expunged from the session
+    assert cache.get(2) is None
+    assert inspect(second).detached
+    assert cache.get(1) is first
+    assert cache.get(3) is third
+    stats = cache.stats()
+    assert (stats.accounts, stats.evictions, stats.hits, stats.misses) == (2, 1, 3, 1)
+
+
+def test_pinned_account_is_not_evicted(bank, session):
+    first, second, third = open_accounts(bank, session, 3)
+    cache = AccountCache(max_accounts=2)
+    cache.put(1, first)
+    cache.pin(1)
+    cache.put(2, second)
+    cache.put(3, third)
+
+    assert cache.get(1) is first
+    assert cache.get(2) is None
+
+
+def test_evicts_to_stay_within_transaction_budget(bank, session):
+    first, second = open_accounts(bank, session, 2)
+    for account in (first, second):
+        for day in (1, 2, 3):
+            bank.add_transaction(account, "10", date(2024, 1, day), session)
+    for account in (first, second):
+        #loads the ledger, which is what the budget counts
+        assert len(account._transactions) == 3
+    cache = AccountCache(max_transactions=5)
+    cache.put(1, first)
+    assert cache.stats().transactions == 3
+
+    cache.put(2, second)
+
+    assert len(cache) == 1
+    assert cache.get(1) is None
+    assert cache.get(2) is second
+    assert cache.stats().transactions == 3
+
+
+def test_resize_evicts_immediately(bank, session):
+    accounts = open_accounts(bank, session, 4)
+    cache = AccountCache()
+    for number, account in enumerate(accounts, start=1):
+        cache.put(number, account)
+
+    cache.resize(max_accounts=1)
+
+    assert len(cache) == 1
+    assert cache.get(4) is accounts[3]
@@ -0,0 +1,50 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from bank import TransactionResult
+
+
+@pytest.fixture
+def account(bank, session):
+    account = bank.open_account("checking", session)
+    session.commit()
+    return account
+
+
+def test_rejected_rows_are_reported_and_the_rest_posted(bank, session, account):
+    number = account.get_account_number()
+    batch = [
+        (number, "100", date(2024, 1, 2)),
+        (number, Decimal("NaN"), date(2024, 1, 3)),
+        (number, "1e30", date(2024, 1, 3)),
+        (number + 1, "5", date(2024, 1, 3)),
+        (number, "-500", date(2024, 1, 3)),
+        (number, "5", date(2024, 1, 1)),
+        (number, "-20.50", date(2024, 1, 4)),
+    ]
+
+    results = bank.add_transactions(batch, session, chunk_size=3)
+
+    assert [result.accepted for result in results] == [True, False, False, False, False, False, True]
+    assert results[1] == TransactionResult(2, number, False, "Decimal('NaN') is not a dollar amount.")
+    assert results[3].reason == "No such account."
+    assert "insufficient account balance" in results[4].reason
+    assert results[5].reason == "New transactions must be from 2024-01-02 onward."
+    session.expire_all()
+    assert account._balance == 7950
+    assert [t.get_amount() for t in account.get_transactions()] == [10000, -2050]
+
+
+def test_unexpected_error_leaves_nothing_pending(bank, session, account):
+    number = account.get_account_number()
+    bank.add_transaction(account, "10", date(2024, 1, 2), session)
+
+    with pytest.raises(TypeError):
+        bank.add_transactions([(number, "5", date(2024, 1, 3)), (number, "5", "2024-01-04")], session)
+    session.commit()
+
+    session.expire_all()
+    assert account.count_transactions() == 1
+    assert account._balance == 1000
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+
+from balance_snapshot import rebuild_balance_snapshots
+
+POSTINGS = [
+    ("1000", date(2024, 1, 3)),
+    ("-250.50", date(2024, 1, 20)),
+    ("75.25", date(2024, 3, 1)),
+    ("-100", date(2024, 3, 31)),
+    ("12.34", date(2024, 6, 15)),
+]
+
+
+def read_snapshots(session):
+    return session.connection().exec_driver_sql(
+        "SELECT _account_id, _month, _balance FROM balance_snapshots ORDER BY _account_id, _month").all()
+
+
+def test_balance_as_of_matches_rebuilt_snapshots(bank, session):
+    checking = bank.open_account("checking", session)
+    savings = bank.open_account("savings", session)
+    session.commit()
+    for amount, day in POSTINGS:
+        bank.add_transaction(checking, amount, day, session)
+    bank.add_transaction(savings, "40", date(2024, 2, 10), session)
+    days = [date(2023, 12, 31) + timedelta(days=n) for n in range(0, 200, 3)]
+    kept = {day: (checking.balance_as_of(day), savings.balance_as_of(day)) for day in days}
+    written = read_snapshots(session)
+
+    assert rebuild_balance_snapshots(session.connection()) == len(written)
+    session.commit()
+
+    #snapshots kept up to date as postings were saved are the ones built from the history
+    assert read_snapshots(session) == written
+    for day in days:
+        expected = sum(t.get_amount() for t in checking.get_transactions(end=day))
+        assert checking.balance_as_of(day) == expected == kept[day][0]
+        assert savings.balance_as_of(day) == kept[day][1]
+    assert checking.balance_as_of(date(2024, 12, 31)) == checking._balance == 73709
+    assert savings.balance_as_of(date(2024, 2, 9)) == 0
+
+
+def test_rolled_back_postings_leave_snapshots_unchanged(bank, session):
+    account = bank.open_account("checking", session)
+    session.commit()
+    bank.add_transaction(account, "500", date(2024, 1, 2), session)
+    before = read_snapshots(session)
+
+    assert account.can_add_transaction(10000, date(2024, 1, 3))
+    account.add_transaction(10000, date(2024, 1, 3), "normal", session, commit=False)
+    session.flush()
+    session.rollback()
+
+    assert read_snapshots(session) == before
+    assert account.balance_as_of(date(2024, 1, 31)) == 50000
@@ -0,0 +1,64 @@
+from batch import BatchRunner, BatchError
+from errors import ConcurrentUpdateError
+
+
+def run(bank, session, text, commit_every=3):
+    return BatchRunner(bank, session, commit_every).run(text.splitlines())
+
+
+def amounts(session):
+    return session.connection().exec_driver_sql(
+        "SELECT _account_id, _amount, _typeof FROM transactions ORDER BY _id").all()
+
+
+def test_bad_amounts_are_charged_to_their_own_lines(bank, session):
+    report = run(bank, session, "open checking\n"
+                                "txn 1 10.00 2024-01-02\n"
+                                "txn 1 nan 2024-01-02\n"
+                                "txn 1 20.00 2024-01-03\n"
+                                "txn 1 1e30 2024-01-04\n"
+                                "txn 1 Infinity 2024-01-04\n")
+
+    assert [error.line for error in report.errors] == [3, 5, 6]
+    assert report.errors[0] == BatchError(3, "txn 1 nan 2024-01-02", "'nan' is not a valid dollar amount.")
+    assert amounts(session) == [(1, 1000, "normal"), (1, 2000, "normal")]
+
+
+def test_rejected_postings_in_the_final_flush_are_reported(bank, session):
+    report = run(bank, session, "open savings\n"
+                                "txn 1 10.00 2024-01-02\n"
+                                "txn 1 -50 2024-01-02\n"
+                                "txn 1 5 2024-01-01\n", commit_every=10)
+
+    assert [(error.line, error.message) for error in report.errors] == [
+        (3, "This transaction could not be completed due to an insufficient account balance."),
+        (4, "New transactions must be from 2024-01-02 onward."),
+    ]
+    assert amounts(session) == [(1, 1000, "normal")]
+
+
+def test_interest_needs_a_transaction(bank, session):
+    report = run(bank, session, "open checking\ninterest 1\ntxn 1 200 2024-01-02\ninterest 1\n")
+
+    assert report.errors == [BatchError(2, "interest 1", "Interest needs at least one transaction.")]
+    assert amounts(session) == [(1, 20000, "normal"), (1, 16, "interest")]
+
+
+def test_conflicting_chunk_is_charged_to_its_lines(bank, session, monkeypatch):
+    add_transactions = bank.add_transactions
+    calls = []
+
+    def flaky(batch, session, chunk_size=500):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise ConcurrentUpdateError()
+        return add_transactions(batch, session, chunk_size)
+
+    monkeypatch.setattr(bank, "add_transactions", flaky)
+    report = run(bank, session, "open checking\n" + "".join(f"txn 1 1 2024-01-{day:02d}\n" for day in range(1, 8)),
+                 commit_every=3)
+
+    assert calls == [3, 3, 1]
+    assert [error.line for error in report.errors] == [5, 6, 7]
+    assert {error.message for error in report.errors} == {ConcurrentUpdateError().message}
+    assert len(amounts(session)) == 4
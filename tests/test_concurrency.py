@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+
+from account import Account
+from concurrency import retry_on_conflict, conflict_counts
+from errors import ConcurrentUpdateError
+
+
+@pytest.fixture
+def account_number(bank, session):
+    account = bank.open_account("checking", session)
+    session.commit()
+    return account.get_account_number()
+
+
+def test_retries_update_based_on_stale_version(Session, account_number):
+    session, other = Session(), Session()
+    account = session.get(Account, account_number)
+    assert account._balance == 0
+    #another process changes the account after this session read it
+    other.get(Account, account_number)._balance = 500
+    other.commit()
+    attempts = []
+
+    def deposit():
+        attempts.append(account._version)
+        account._balance += 100
+        session.commit()
+
+    stale_before = conflict_counts["stale"]
+    retry_on_conflict(deposit, session, base_delay=0)
+
+    #the first attempt wrote over a stale version; the retry reloaded the account and kept both changes
+    assert attempts == [1, 2]
+    assert conflict_counts["stale"] == stale_before + 1
+    other.expire_all()
+    assert other.get(Account, account_number)._balance == 600
+    assert other.get(Account, account_number)._version == 3
+    session.close()
+    other.close()
+
+
+def test_gives_up_after_every_attempt_conflicts(session, bank):
+    calls = []
+
+    def always_stale():
+        calls.append(None)
+        raise StaleDataError("stale")
+
+    gave_up_before = conflict_counts["gave_up"]
+    with pytest.raises(ConcurrentUpdateError):
+        retry_on_conflict(always_stale, session, attempts=3, base_delay=0)
+    assert len(calls) == 3
+    assert conflict_counts["gave_up"] == gave_up_before + 1
+
+
+def test_other_errors_are_not_retried(session, bank):
+    calls = []
+
+    def broken():
+        calls.append(None)
+        raise OperationalError("SELECT", {}, Exception("no such table: nowhere"))
+
+    with pytest.raises(OperationalError):
+        retry_on_conflict(broken, session, base_delay=0)
+    assert len(calls) == 1
+
+
+def test_returns_the_operation_result(session, bank):
+    assert retry_on_conflict(lambda: 42, session) == 42
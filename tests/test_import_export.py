@@ -0,0 +1,103 @@
+from datetime import date
+
+import pytest
+
+from bank import Bank
+from database import make_session_factory
+from exporter import export_transactions
+from importer import read_transactions
+
+
+def history(session):
+    return session.connection().exec_driver_sql(
+        "SELECT _account_id, _amount, _date, _typeof FROM transactions ORDER BY _account_id, _date, _id").all()
+
+
+@pytest.fixture
+def source(bank, session):
+    """A checking account with interest and low-balance fees, and a savings account with interest."""
+    checking = bank.open_account("checking", session)
+    savings = bank.open_account("savings", session)
+    session.commit()
+    bank.add_transaction(checking, "50", date(2024, 1, 5), session)
+    bank.apply_interest_and_fees(checking, session)
+    bank.add_transaction(checking, "250.25", date(2024, 2, 3), session)
+    bank.apply_interest_and_fees(checking, session)
+    bank.add_transaction(savings, "1000", date(2024, 1, 9), session)
+    bank.apply_interest_and_fees(savings, session)
+    return bank
+
+
+@pytest.fixture
+def target(tmp_path):
+    session = make_session_factory(str(tmp_path / "target.db"))()
+    bank = Bank()
+    session.add(bank)
+    session.commit()
+    bank.open_account("checking", session)
+    bank.open_account("savings", session)
+    session.commit()
+    yield bank, session
+    session.close()
+
+
+@pytest.mark.parametrize("name", ["export.csv", "export.csv.gz", "export.jsonl", "export.jsonl.gz"])
+def test_round_trip_keeps_types(tmp_path, session, source, target, name):
+    path = str(tmp_path / name)
+    assert export_transactions(session, path) == 7
+    bank, target_session = target
+
+    results = bank.add_transactions(read_transactions(path), target_session)
+
+    assert all(result.accepted for result in results)
+    assert history(target_session) == history(session)
+    assert [row[3] for row in history(target_session)].count("fees") == 1
+    checking = bank.get_account(1)
+    assert checking._balance == source.get_account(1)._balance
+    assert checking._last_interest_date == date(2024, 2, 29)
+    #the restored account closes its next month as usual
+    bank.add_transaction(checking, "1", date(2024, 3, 1), target_session)
+    bank.apply_interest_and_fees(checking, target_session)
+    assert [row[2:] for row in history(target_session) if row[0] == 1][-1] == ("2024-03-31", "interest")
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / "rows.csv"
+    path.write_text("account,amount,date,type\n" + "".join(f"{row}\n" for row in rows))
+    return str(path)
+
+
+def test_typed_rows_are_rejected_for_accounts_with_history(tmp_path, bank, session):
+    account = bank.open_account("checking", session)
+    session.commit()
+    bank.add_transaction(account, "100", date(2024, 3, 1), session)
+    path = write_csv(tmp_path, ["1,-99999.00,2024-03-02,fees", "1,5.00,2024-03-31,interest", "1,1.00,2024-03-03,"])
+
+    results = bank.add_transactions(read_transactions(path), session)
+
+    assert [result.accepted for result in results] == [False, False, True]
+    assert "without transactions" in results[0].reason
+    session.expire_all()
+    assert account._balance == 10100
+    assert account._last_interest_date is None
+
+
+def test_interest_is_restored_once_per_month(tmp_path, bank, session):
+    account = bank.open_account("savings", session)
+    session.commit()
+    path = write_csv(tmp_path, ["1,100.00,2024-01-02,normal", "1,0.41,2024-01-31,interest",
+                                "1,0.41,2024-01-31,interest"])
+
+    results = bank.add_transactions(read_transactions(path), session)
+
+    assert [result.accepted for result in results] == [True, True, False]
+    assert results[2].reason == "Cannot apply interest and fees again in the month of January."
+    assert account._balance == 10041
+
+
+@pytest.mark.parametrize("amount", ["nan", "Infinity", "1e30", "ten"])
+def test_import_rejects_bad_amounts(tmp_path, amount):
+    path = write_csv(tmp_path, ["1,10.00,2024-01-02,normal", f"1,{amount},2024-01-03,normal"])
+
+    with pytest.raises(ValueError, match="Line 3"):
+        read_transactions(path)
@@ -0,0 +1,81 @@
+from datetime import date
+import sqlite3
+
+from sqlalchemy import inspect
+
+from account import Account
+from database import make_engine, make_session_factory
+import migrations
+
+#the schema bank.db had before the migrations, with Numeric dollar amounts
+BASELINE_SCHEMA = """
+CREATE TABLE bank (_id INTEGER NOT NULL, _number_accounts_opened INTEGER, PRIMARY KEY (_id));
+CREATE TABLE account (_bank_id INTEGER, _account_number INTEGER NOT NULL, _balance NUMERIC, _type VARCHAR,
+                      PRIMARY KEY (_account_number), FOREIGN KEY(_bank_id) REFERENCES bank (_id));
+CREATE TABLE transactions (_id INTEGER NOT NULL, _amount NUMERIC, _date DATE, _typeof VARCHAR, _account_id INTEGER,
+                           PRIMARY KEY (_id), FOREIGN KEY(_account_id) REFERENCES account (_account_number));
+"""
+
+
+def make_baseline_db(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(BASELINE_SCHEMA)
+    connection.execute("INSERT INTO bank VALUES (1, 2)")
+    connection.executemany("INSERT INTO account VALUES (1, ?, ?, ?)",
+                           [(1, 999.6, "checking"), (2, 46.0, "savings")])
+    connection.executemany("INSERT INTO transactions (_amount, _date, _typeof, _account_id) VALUES (?, ?, ?, ?)", [
+        (1000, "2024-01-05", "normal", 1),
+        (0.125, "2024-01-31", "interest", 1),
+        (-2.675, "2024-02-03", "normal", 1),
+        (2.15, "2024-02-29", "interest", 1),
+        (50, "2024-03-10", "normal", 2),
+        (-4.0, "2024-03-31", "fees", 2),
+    ])
+    connection.commit()
+    connection.close()
+
+
+def test_migrates_baseline_database(db_path):
+    make_baseline_db(db_path)
+
+    Session = make_session_factory(db_path)
+
+    engine = Session.kw["bind"]
+    with engine.connect() as connection:
+        assert migrations.get_version(connection) == migrations.LATEST_VERSION
+        amounts = connection.exec_driver_sql("SELECT _amount FROM transactions ORDER BY _id").scalars().all()
+        accounts = connection.exec_driver_sql(
+            "SELECT _account_number, _balance, _version, _latest_transaction_date, _last_interest_date "
+            "FROM account ORDER BY _account_number").all()
+        snapshots = connection.exec_driver_sql(
+            "SELECT _account_id, _month, _balance FROM balance_snapshots ORDER BY _account_id, _month").all()
+    #rounded half to even, like newly posted amounts
+    assert amounts == [100000, 12, -268, 215, 5000, -400]
+    assert accounts == [(1, 99959, 1, "2024-02-29", "2024-02-29"), (2, 4600, 1, "2024-03-31", None)]
+    assert snapshots == [(1, "2024-01-01", 100012), (1, "2024-02-01", 99959), (2, "2024-03-01", 4600)]
+    indexes = {index["name"] for index in inspect(engine).get_indexes("transactions")}
+    assert {"ix_transactions_account_date", "ix_transactions_account_type_date"} <= indexes
+
+    session = Session()
+    account = session.get(Account, 1)
+    assert account.balance_as_of(date(2024, 1, 31)) == 100012
+    assert account.balance_as_of(date(2024, 2, 15)) == 99744
+    session.close()
+
+
+def test_migrating_twice_changes_nothing(db_path):
+    make_baseline_db(db_path)
+    make_session_factory(db_path)
+    with make_engine(db_path).connect() as connection:
+        before = connection.exec_driver_sql("SELECT _amount FROM transactions ORDER BY _id").scalars().all()
+
+    make_session_factory(db_path)
+
+    with make_engine(db_path).connect() as connection:
+        assert connection.exec_driver_sql("SELECT _amount FROM transactions ORDER BY _id").scalars().all() == before
+
+
+def test_new_database_is_stamped(db_path):
+    make_session_factory(db_path)
+    with make_engine(db_path).connect() as connection:
+        assert migrations.get_version(connection) == migrations.LATEST_VERSION
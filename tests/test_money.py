@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+
+from money import to_cents, apply_rate, cents_to_dollars, parse_dollars, MAX_CENTS
+
+
+@pytest.mark.parametrize("amount, cents", [
+    ("12.34", 1234),
+    ("-5.44", -544),
+    (7, 700),
+    (Decimal("0.1"), 10),
+    #half a cent rounds to the even cent
+    ("0.125", 12),
+    ("0.135", 14),
+    ("-2.675", -268),
+    ("-2.665", -266),
+])
+def test_to_cents(amount, cents):
+    assert to_cents(amount) == cents
+
+
+def test_to_cents_rejects_text():
+    with pytest.raises(ArithmeticError):
+        to_cents("ten dollars")
+
+
+@pytest.mark.parametrize("cents, numerator, denominator, expected", [
+    (10000, 8, 10000, 8),
+    (-10000, 8, 10000, -8),
+    #0.5 and 1.5 cents round to 0 and 2, -0.5 and -1.5 to 0 and -2
+    (625, 8, 10000, 0),
+    (1875, 8, 10000, 2),
+    (-625, 8, 10000, 0),
+    (-1875, 8, 10000, -2),
+    (1876, 8, 10000, 2),
+    (0, 41, 1000, 0),
+])
+def test_apply_rate(cents, numerator, denominator, expected):
+    assert apply_rate(cents, numerator, denominator) == expected
+
+
+def test_apply_rate_matches_decimal_rounding():
+    for cents in range(-3000, 3000, 7):
+        exact = Decimal(cents * 41) / 1000
+        assert apply_rate(cents, 41, 1000) == int(exact.quantize(Decimal(1), rounding="ROUND_HALF_EVEN"))
+
+
+@pytest.mark.parametrize("cents", [0, 5, -5, 1234, -123456, 10 ** 12])
+def test_cents_to_dollars_round_trip(cents):
+    assert to_cents(cents_to_dollars(cents)) == cents
+
+
+@pytest.mark.parametrize("amount", ["12.34", "-5", 7, Decimal("0.125"), 12.5, " 3.10 "])
+def test_parse_dollars(amount):
+    assert parse_dollars(amount) == Decimal(str(amount).strip())
+
+
+@pytest.mark.parametrize("amount", ["nan", "NaN", "sNaN", "Infinity", "-inf", "1e30", "ten", "", None, [5],
+                                    str((Decimal(MAX_CENTS) + 1) / 100)])
+def test_parse_dollars_rejects(amount):
+    with pytest.raises(ValueError):
+        parse_dollars(amount)
+
+
+def test_parse_dollars_accepts_largest_amount():
+    assert to_cents(parse_dollars(cents_to_dollars(MAX_CENTS))) == MAX_CENTS
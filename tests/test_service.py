@@ -0,0 +1,112 @@
+import asyncio
+from datetime import date
+import json
+import os
+
+import pytest
+
+from client import AsyncBankClient
+from errors import ServiceError
+from service import BankService, MAX_PAGE
+
+
+def run_with_service(tmp_path, test):
+    """Starts the service on a socket in tmp_path and runs test(client, send) against it, where send posts one raw line."""
+    socket_path = str(tmp_path / "bank.sock")
+
+    async def main():
+        service = BankService(str(tmp_path / "bank.db"))
+        server = asyncio.create_task(service.serve(socket_path=socket_path))
+        while not os.path.exists(socket_path):
+            await asyncio.sleep(0.01)
+        client = await AsyncBankClient.connect(socket_path=socket_path)
+
+        async def send(line):
+            #a connection of its own, so raw requests can be in flight together
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            writer.write(line.encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            writer.close()
+            return response
+
+        try:
+            await test(client, send)
+        finally:
+            await client.close()
+            server.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await server
+
+    asyncio.run(main())
+
+
+def test_rejects_malformed_requests(tmp_path):
+    async def test(client, send):
+        assert (await send("not json"))["type"] == "BadRequest"
+        assert (await send("[1, 2]"))["error"] == "A request must be a JSON object."
+        assert (await send('{"id": 7}')) == {"id": 7, "ok": False, "error": "Missing 'op'.", "type": "BadRequest"}
+        assert (await send('{"id": 8, "op": "withdraw"}'))["error"] == "Unknown op 'withdraw'."
+        for op in ('["x"]', '{"a": 1}', "null", "3"):
+            assert (await send(f'{{"id": 9, "op": {op}}}')) == {"id": 9, "ok": False, "error": "The op must be a string.",
+                                                               "type": "BadRequest"}
+        assert (await send('{"op": "ping"}'))["result"] == "pong"
+
+    run_with_service(tmp_path, test)
+
+
+def test_bad_postings_are_rejected_alone(tmp_path):
+    async def test(client, send):
+        account = (await client.open_account("checking"))["account"]
+        bad = [
+            {"account": account, "amount": "NaN", "date": "2024-01-02"},
+            {"account": account, "amount": "1e30", "date": "2024-01-02"},
+            {"account": account, "amount": "10", "date": 20240102},
+            {"account": account, "amount": "10", "date": "January"},
+            {"account": [account], "amount": "10", "date": "2024-01-02"},
+            {"account": account, "date": "2024-01-02"},
+        ]
+        requests = [send(json.dumps(dict(posting, op="post_transaction", id=i))) for i, posting in enumerate(bad)]
+        good = client.post_transaction(account, "25.10", date(2024, 1, 2))
+        responses = await asyncio.gather(*requests)
+        assert [response["ok"] for response in responses] == [False] * len(bad)
+        assert {response["type"] for response in responses} == {"BadRequest"}
+        assert responses[5]["error"] == "Missing 'amount'."
+        #the valid posting queued alongside them is still committed
+        assert (await good) == {"account": account}
+        assert (await client.get_account(account))["balance"] == 2510
+
+    run_with_service(tmp_path, test)
+
+
+def test_domain_errors_are_reported(tmp_path):
+    async def test(client, send):
+        account = (await client.open_account("checking"))["account"]
+        with pytest.raises(ServiceError) as error:
+            await client.post_transaction(account, "-5", date(2024, 1, 2))
+        assert error.value.kind == "PostingRejected"
+        with pytest.raises(ServiceError) as error:
+            await client.get_account(account + 1)
+        assert error.value.message == "No such account."
+        with pytest.raises(ServiceError) as error:
+            await client.open_account("brokerage")
+        assert error.value.kind == "BadRequest"
+        with pytest.raises(ServiceError) as error:
+            await client.apply_interest(account)
+        assert error.value.message == "Interest needs at least one transaction."
+
+    run_with_service(tmp_path, test)
+
+
+def test_list_transactions_checks_its_query(tmp_path):
+    async def test(client, send):
+        account = (await client.open_account("savings"))["account"]
+        await client.post_transaction(account, "100", date(2024, 1, 2))
+        await client.post_transaction(account, "-20", date(2024, 1, 9))
+        assert [t["amount"] for t in await client.list_transactions(account, start=date(2024, 1, 5))] == [-2000]
+        for query in ({"limit": -1}, {"limit": MAX_PAGE + 1}, {"offset": -3}, {"limit": [5]},
+                      {"start": 20240101}, {"end": "soon"}):
+            response = await send(json.dumps(dict(query, op="list_transactions", account=account)))
+            assert response["ok"] is False and response["type"] == "BadRequest", query
+
+    run_with_service(tmp_path, test)
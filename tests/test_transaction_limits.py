@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+
+from bank import Bank
+from errors import TransactionLimitError
+
+
+@pytest.fixture
+def savings(bank, session):
+    account = bank.open_account("savings", session)
+    session.commit()
+    bank.add_transaction(account, "100", date(2024, 1, 1), session)
+    return account
+
+
+def post_from_other_session(Session, bank, account, day):
+    other = Session()
+    other_bank = other.get(Bank, bank._id)
+    other_bank.add_transaction(other_bank.get_account(account.get_account_number()), "1", day, other)
+    other.close()
+
+
+def test_daily_limit_counts_postings_from_other_sessions(Session, bank, session, savings):
+    bank.add_transaction(savings, "1", date(2024, 1, 2), session)
+    post_from_other_session(Session, bank, savings, date(2024, 1, 2))
+    #ends this session's transaction, so the account is reloaded with the other session's version
+    session.commit()
+
+    with pytest.raises(TransactionLimitError) as error:
+        bank.add_transaction(savings, "1", date(2024, 1, 2), session)
+
+    assert "2 transactions in this day" in error.value.message
+    assert savings.count_transactions(date(2024, 1, 2), date(2024, 1, 2)) == 2
+
+
+def test_monthly_limit_counts_postings_from_other_sessions(Session, bank, session, savings):
+    for day in (2, 3):
+        bank.add_transaction(savings, "1", date(2024, 1, day), session)
+    for day in (4, 5):
+        post_from_other_session(Session, bank, savings, date(2024, 1, day))
+    session.expire(savings)
+
+    with pytest.raises(TransactionLimitError):
+        bank.add_transaction(savings, "1", date(2024, 1, 6), session)
+
+    assert savings.count_transactions(date(2024, 1, 1), date(2024, 1, 31)) == 5
+
+
+def test_daily_limit_with_loaded_ledger(Session, bank, session, savings):
+    bank.add_transaction(savings, "1", date(2024, 1, 2), session)
+    assert len(savings._transactions) == 2
+    post_from_other_session(Session, bank, savings, date(2024, 1, 2))
+    session.commit()
+
+    with pytest.raises(TransactionLimitError):
+        bank.add_transaction(savings, "1", date(2024, 1, 2), session)
@@ -1,6 +1,6 @@
-from decimal import Decimal
+from money import format_cents
 
-from sqlalchemy import Integer, String, ForeignKey, Date, Numeric
+from sqlalchemy import Integer, String, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship, backref, mapped_column
 from database import Base
 
@@ -8,14 +8,21 @@ class Transaction(Base):
 
     __tablename__ = "transactions"
     _id = mapped_column(Integer, primary_key=True)
-    _amount = mapped_column(Numeric)
+    #amount in integer cents
+    _amount = mapped_column(Integer)
     _date = mapped_column(Date)
     _typeof = mapped_column(String)
     _account_id = mapped_column(Integer, ForeignKey('account._account_number')) 
 
+    #history and date-range reads, and the per-type checks for limits and interest
+    __table_args__ = (
+        Index("ix_transactions_account_date", "_account_id", "_date"),
+        Index("ix_transactions_account_type_date", "_account_id", "_typeof", "_date"),
+    )
+
     def __init__(self, amount, date, typeof):
         """Initialize a new Transaction instance."""
-        self._amount = Decimal(amount)
+        self._amount = amount
         self._date = date
         self._typeof = typeof
 
@@ -28,7 +35,7 @@ class Transaction(Base):
         return self._date.day
 
     def get_amount(self):
-        """Returns the amount of the transaction."""
+        """Returns the amount of the transaction in cents."""
         return self._amount
     
     def get_type(self):
@@ -38,14 +45,24 @@ class Transaction(Base):
     def __str__(self):
         """Returns string representation of instance"""
         formatted_date = self._date.strftime("%Y-%m-%d")
-        return f"{formatted_date}, ${self._amount:,.2f}"
+        return f"{formatted_date}, {format_cents(self._amount)}"
     
+    def _sort_key(self):
+        """Orders by date, breaking ties by insertion order with unsaved transactions last."""
+        return (self._date, self._id is None, self._id or 0)
+
     def __lt__(self, other):
         """Allows comparison of transactions with date"""
-        return self._date < other._date
+        return self._sort_key() < other._sort_key()
     
     def __eq__(self, other):
-        """Allows comparison of transactions based on date"""
-        return self._date == other._date
+        """Transactions are equal when they are the same saved row or the same unsaved object"""
+        if not isinstance(other, Transaction):
+            return NotImplemented
+        if self._id is None or other._id is None:
+            return self is other
+        return self._id == other._id
+
+    __hash__ = Base.__hash__
     
 